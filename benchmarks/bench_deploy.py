@@ -0,0 +1,157 @@
+""" Deploy engine overhead benchmarks.
+
+Runs a full DjangoApp and DataBase setup against the in-process
+tests.fakessh.FakeSSHServer, first on a fresh "droplet" and then as a no-op
+re-run, and reports wall time, round trips, channel opens and bytes on the
+wire for each.
+
+    python benchmarks/bench_deploy.py --latency 0.05 [--batch] [--json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'dj_droplet'))
+sys.path.insert(0, ROOT)
+
+import components  # noqa: E402
+from droplet import Droplet  # noqa: E402
+from remote import SFTPPool  # noqa: E402
+from state import StateIndex  # noqa: E402
+from tests.fakessh import FakeSSHServer  # noqa: E402
+
+
+class BenchGitHub:
+    branch = 'main'
+    url = 'https://github.com/example/benchapp.git'
+    working_dir = None
+
+
+class BenchEnv:
+    vars = {'DEBUG': 'False'}
+
+    def write_env(self, fo, **kwargs):
+        for key, value in self.vars.items():
+            fo.write(f'{key} = {value}\n')
+
+
+BENCH_DROPLET = {
+    'id': 1, 'name': 'bench', 'memory': 2048, 'vcpus': 2, 'disk': 50,
+    'size_slug': 's-2vcpu-2gb', 'region': {'slug': 'ams3'},
+    'image': {'slug': 'ubuntu-22-04-x64'},
+    'networks': {'v4': [{'type': 'public', 'ip_address': '127.0.0.1'}]},
+}
+
+
+# the parts of a stock postgresql.conf the deploy edits
+POSTGRESQL_CONF = (
+    "max_connections = 100\t\t\t# (change requires restart)\n"
+    "shared_buffers = 128MB\t\t\t# min 128kB\n"
+    "#work_mem = 4MB\t\t\t\t# min 64kB\n"
+    "#wal_level = replica\t\t\t# minimal, replica, or logical\n"
+    "max_wal_size = 1GB\n"
+    "#archive_mode = off\t\t# enables archiving; off, on, or always\n"
+)
+
+
+def seed_droplet(server):
+    path = server.local_path('/etc/postgresql/14/main/postgresql.conf')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as fo:
+        fo.write(POSTGRESQL_CONF)
+
+
+def build_django_app(client):
+    app = components.DjangoApp.__new__(components.DjangoApp)
+    app.name = 'benchapp'
+    app.domain_name = 'example.com'
+    app.password = 'benchpassword'
+    app.gunicorn_profile = 'io'
+    app.github = BenchGitHub()
+    app.wsgi_application = 'benchapp.wsgi:application'
+    app.env = BenchEnv()
+    app.droplet = Droplet(BENCH_DROPLET)
+    app._ssh = client
+    return app
+
+
+def build_database(client):
+    dbuser = components.DataBaseUser.__new__(components.DataBaseUser)
+    dbuser.name, dbuser.passwd, dbuser._ssh = 'benchuser', 'benchpassword', client
+    db = components.DataBase.__new__(components.DataBase)
+    db.name, db.dbuser, db._ssh = 'benchdb', dbuser, client
+    db.droplet = Droplet(BENCH_DROPLET)
+    return db
+
+
+def setup_database(db, **kwargs):
+    db.dbuser._setup(**kwargs)
+    db._setup(**kwargs)
+
+
+SCENARIOS = [
+    ('DjangoApp', build_django_app, lambda app, **kwargs: app._setup(**kwargs)),
+    ('DataBase', build_database, setup_database),
+]
+
+
+def run_once(server, build, setup, **kwargs):
+    """ One deploy run as a fresh process would do it: new connection, new
+    state index and SFTP session """
+    client = server.connect()
+    server.counters.reset()
+    sftp_opens = SFTPPool.opens
+    obj = build(client)
+    start = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        setup(obj, **kwargs)
+    wall = time.time() - start
+    result = server.counters.as_dict()
+    result['wall'] = wall
+    result['sftp_sessions'] = SFTPPool.opens - sftp_opens
+    SFTPPool.close(client)
+    StateIndex._indexes.pop(client, None)
+    client.close()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='seconds added to every exec and SFTP round trip')
+    parser.add_argument('--batch', action='store_true',
+                        help='run setup steps as one remote script')
+    parser.add_argument('--json', action='store_true', help='print JSON results')
+    args = parser.parse_args(argv)
+    # the fake server logs every client disconnect
+    logging.getLogger('paramiko').setLevel(logging.CRITICAL)
+
+    results = []
+    for name, build, setup in SCENARIOS:
+        with FakeSSHServer(latency=args.latency) as server:
+            seed_droplet(server)
+            for run in ('first run', 'no-op re-run'):
+                result = run_once(server, build, setup, batch=args.batch)
+                result['scenario'] = f'{name} {run}'
+                results.append(result)
+
+    if args.json:
+        print(json.dumps(results, indent=1))
+        return
+    print(f"{'scenario' : <24} | {'wall s' : >7} | {'round trips' : >11} | "
+          f"{'channels' : >8} | {'execs' : >5} | {'sftp ops' : >8} | {'bytes' : >9}")
+    for result in results:
+        print(f"{result['scenario'] : <24} | {result['wall'] : >7.2f} | "
+              f"{result['round_trips'] : >11} | {result['channel_opens'] : >8} | "
+              f"{result['execs'] : >5} | {result['sftp_ops'] : >8} | "
+              f"{result['bytes_sent'] + result['bytes_received'] : >9}")
+
+
+if __name__ == '__main__':
+    main()
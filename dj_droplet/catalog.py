@@ -0,0 +1,102 @@
+import json
+import os
+import threading
+import time
+
+# The DigitalOcean catalog (images, regions, sizes, ssh keys) changes
+# rarely. Listings are kept as JSON files under the user's cache dir: fresh
+# ones are returned as they are, stale ones are returned while a background
+# thread fetches a new copy, and only missing or expired ones block.
+
+
+def default_cache_dir():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'dj_droplet')
+
+
+class CatalogCache:
+    # stale entries are still served, and refreshed, up to this age
+    MAX_STALE = 7 * 24 * 3600
+
+    def __init__(self, directory=None, max_stale=None) -> None:
+        self.directory = directory or default_cache_dir()
+        self.max_stale = self.MAX_STALE if max_stale is None else max_stale
+        self._lock = threading.Lock()
+        self._refreshing = {}
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.json')
+
+    def _read(self, key):
+        try:
+            with open(self._path(key)) as fo:
+                entry = json.load(fo)
+            return entry['fetched'], entry['data']
+        except (OSError, ValueError, KeyError):
+            return None, None
+
+    def _write(self, key, data):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = f'{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'w') as fo:
+            json.dump({'fetched': time.time(), 'data': data}, fo)
+        os.replace(tmp, self._path(key))
+
+    def get(self, key, fetch, ttl):
+        """ fetch() returns JSON serializable data, it is called when the
+        cached copy of key is older than ttl seconds """
+        fetched, data = self._read(key)
+        age = None if fetched is None else time.time() - fetched
+        if age is not None and age < ttl:
+            return data
+        if age is not None and age < self.max_stale:
+            self._refresh_in_background(key, fetch)
+            return data
+        return self.refresh(key, fetch)
+
+    def refresh(self, key, fetch):
+        data = fetch()
+        self._write(key, data)
+        return data
+
+    def _refresh_in_background(self, key, fetch):
+        with self._lock:
+            thread = self._refreshing.get(key)
+            if thread is not None and thread.is_alive():
+                return
+            thread = threading.Thread(target=self._refresh_quietly, args=(key, fetch),
+                                      daemon=True)
+            self._refreshing[key] = thread
+        thread.start()
+
+    def _refresh_quietly(self, key, fetch):
+        try:
+            self.refresh(key, fetch)
+        except Exception:
+            # the stale copy stays, the next get() tries again
+            pass
+
+    def wait(self):
+        """ Wait for background refreshes """
+        with self._lock:
+            threads = list(self._refreshing.values())
+        for thread in threads:
+            thread.join()
+
+    def invalidate(self, key=None):
+        """ Drop key, or every cached listing """
+        if key is not None:
+            keys = [key]
+        elif os.path.isdir(self.directory):
+            keys = [name[:-len('.json')] for name in os.listdir(self.directory)
+                    if name.endswith('.json')]
+        else:
+            keys = []
+        for name in keys:
+            try:
+                os.remove(self._path(name))
+            except FileNotFoundError:
+                pass
+
+
+catalog = CatalogCache()
@@ -1,5 +1,8 @@
+import os
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from PyInquirer import prompt, Separator
 from examples import custom_style_1, custom_style_2, custom_style_3
 from prompt_toolkit.validation import ValidationError, Validator
@@ -7,6 +10,10 @@ import py_doctl as doctl
 from py_doctl import DOCtlError
 import socket
 
+from catalog import catalog, default_cache_dir
+from remote import DropletNotReady, SFTPPool, SSHConnections, backoff
+from timing import span, tracer
+
 
 class MultipleItemException(Exception):
     pass
@@ -16,19 +23,108 @@ class DropletExistException(Exception):
     pass
 
 
+# the catalog cache's time to live for images, regions and sizes, and for ssh keys
+CATALOG_TTL = 24 * 3600
+SSH_KEYS_TTL = 3600
+# seconds the droplet names used to validate new names are trusted
+DROPLET_NAMES_TTL = 30
+# seconds a new droplet gets to show a public IP
+IP_DEADLINE = 180
+
+
+class Prefetch:
+    """ Runs the listings the prompts will need concurrently while the
+    user is still answering. take() hands out a listing once, later calls
+    fetch as usual. """
+
+    def __init__(self) -> None:
+        self.futures = {}
+        self.durations = {}
+        self.waited = 0.0
+        self.taken = []
+        self._lock = threading.Lock()
+
+    def start(self, jobs):
+        parent = tracer.current()
+        executor = ThreadPoolExecutor(max_workers=len(jobs))
+        for name, fetch in jobs.items():
+            self.futures[name] = executor.submit(self._timed, name, fetch, parent)
+        executor.shutdown(wait=False)
+        return self
+
+    def _timed(self, name, fetch, parent):
+        start = time.time()
+        try:
+            with tracer.adopt(parent), tracer.span(f'prefetch {name}', 'remote'):
+                return fetch()
+        finally:
+            self.durations[name] = time.time() - start
+
+    def take(self, name, fetch):
+        with self._lock:
+            future = self.futures.pop(name, None)
+        if future is None:
+            return fetch()
+        start = time.time()
+        try:
+            result = future.result()
+        except Exception:
+            # failed in the background, fail again where the error is expected
+            return fetch()
+        finally:
+            self.waited += time.time() - start
+        self.taken.append(name)
+        return result
+
+    def report(self):
+        fetch_time = sum(self.durations[name] for name in self.taken)
+        saved = fetch_time - self.waited
+        print(f'Prefetching {", ".join(self.taken) or "nothing"} saved {saved:.1f}s '
+              f'({fetch_time:.1f}s of API calls, {self.waited:.1f}s waited)')
+
+
+prefetch = Prefetch()
+
+
+class DoCtlIndex:
+    """ Lookups into one fetched listing """
+
+    def __init__(self, items) -> None:
+        self.items = items
+        self.fetched = time.time()
+        self.by_slug = {item.slug: item for item in items if item.slug}
+        self.by_name = {item.name: item for item in items if item.name}
+
+
 class DoCtlManager:
+    # class -> index of its last listing, shared by every manager of a class
+    _indexes = {}
 
     def __init__(self, doctl, klass) -> None:
         self.doctl = doctl
         self.klass = klass
 
-    def _get_list(self):
+    def _fetch(self):
         return self.doctl.list()
 
+    def _get_list(self):
+        return prefetch.take(self.klass.__name__, self._fetch)
+
     def list(self):
-        return [self.klass(item) for item in self._get_list()]
+        items = [self.klass(item) for item in self._get_list()]
+        self._indexes[self.klass] = DoCtlIndex(items)
+        return items
+
+    def index(self):
+        """ The index of the last listing, lists once if there is none """
+        index = self._indexes.get(self.klass)
+        if index is None:
+            self.list()
+            index = self._indexes[self.klass]
+        return index
 
     def get(self, id):
+        # always live, callers poll for an ip address or look for a resize
         obj = self.doctl.get(str(id))
         if len(obj) > 1:
             raise MultipleItemException(
@@ -41,21 +137,23 @@ class DoCtlManager:
 
 class DoCtlManagerList(DoCtlManager):
 
-    def _get_list(self):
-        return self.doctl()
+    def _fetch(self):
+        if self.klass._cache_ttl is None:
+            return self.doctl()
+        return catalog.get(self.klass.__name__, self.doctl, self.klass._cache_ttl)
 
     def get(self, slug):
         if not slug:
             return None
-        for item in self.list():
-            if item.slug == slug:
-                return item
+        return self.index().by_slug.get(slug)
 
 
 class DoCtl(dict):
 
     _manager = DoCtlManager
     _doctl = doctl
+    # seconds a listing is served from the catalog cache, None disables it
+    _cache_ttl = None
 
     @classmethod
     def objects(cls):
@@ -92,6 +190,7 @@ class DropletManager(DoCtlManager):
             raise DropletExistException(
                 f'Droplet with name {name} already exists')
         res = self.doctl.create(name, image, region, size, **kwargs)
+        droplet_names.add(name)
         return self.klass(res[0])
 
 
@@ -109,6 +208,20 @@ class Droplet(DoCtl):
     def size(self):
         return self.get('size_slug', None)
 
+    @property
+    def vcpus(self):
+        return self.get('vcpus') or self.get('size', {}).get('vcpus', 1)
+
+    @property
+    def memory(self):
+        """ RAM in MB """
+        return self.get('memory') or self.get('size', {}).get('memory', 0)
+
+    @property
+    def disk(self):
+        """ Disk in GB """
+        return self.get('disk') or self.get('size', {}).get('disk', 0)
+
     @property
     def region(self):
         return self.get('region', {}).get('slug', None)
@@ -131,7 +244,36 @@ class Droplet(DoCtl):
         )
 
 
+class DropletNames:
+    """ Names of the account's droplets, from the last droplet listing
+    while it is younger than ttl seconds """
+
+    def __init__(self, ttl=DROPLET_NAMES_TTL) -> None:
+        self.ttl = ttl
+        # created since the last listing
+        self._created = set()
+
+    def names(self):
+        manager = Droplet.objects()
+        index = manager._indexes.get(Droplet)
+        if index is None or time.time() - index.fetched > self.ttl:
+            manager.list()
+            index = manager.index()
+            self._created = set()
+        return set(index.by_name) | self._created
+
+    def add(self, name):
+        self._created.add(name)
+
+    def __contains__(self, name):
+        return name in self.names()
+
+
+droplet_names = DropletNames()
+
+
 class Region(DoCtl):
+    _cache_ttl = CATALOG_TTL
     _doctl = doctl.compute.region_list
     _manager = DoCtlManagerList
 
@@ -141,6 +283,7 @@ class Region(DoCtl):
 
 
 class Image(DoCtl):
+    _cache_ttl = CATALOG_TTL
     _doctl = doctl.compute.image.list_distribution
     _manager = DoCtlManagerList
 
@@ -150,6 +293,7 @@ class Image(DoCtl):
 
 
 class Size(DoCtl):
+    _cache_ttl = CATALOG_TTL
     _doctl = doctl.compute.size_list
     _manager = DoCtlManagerList
 
@@ -185,19 +329,22 @@ def image_choices(ans):
     ]
 
 
+def available_slugs(items):
+    return {item.slug for item in items if item.get('available', True)}
+
+
 def region_choices(ans):
-    region_slugs = ans['image']['regions']
-    regions = []
-    for region in Region.objects().list():
-        if region.slug in region_slugs:
-            regions.append({'name': region.display_name, 'value': region})
-    return regions
+    regions = Region.objects().list()
+    region_slugs = set(ans['image']['regions']) & available_slugs(regions)
+    return [{'name': region.display_name, 'value': region}
+            for region in regions if region.slug in region_slugs]
 
 
 def size_choices(ans):
-    size_slugs = ans['region']['sizes']
+    size_list = Size.objects().list()
+    size_slugs = set(ans['region']['sizes']) & available_slugs(size_list)
     sizes = [Separator(), Separator(Size.display_header()), ]
-    for size in Size.objects().list():
+    for size in size_list:
         if size.slug in size_slugs:
             sizes.append({'name': size.display_name, 'value': size})
     sizes += [Separator(Size.display_header()), ]
@@ -214,7 +361,9 @@ def droplet_choices(ans):
 def droplet_name_validate(name):
     if not name:
         return "Enter a valid name"
-    if droplet_exists(name):
+    # validation runs on every edit of the answer, DropletManager.create
+    # checks with the API before creating
+    if name in droplet_names:
         return f'A droplet with name {name} already exist, choose a different name'
     return True
 
@@ -302,12 +451,14 @@ def create_droplet():
     droplet = Droplet.objects().create(**kwargs, ssh_keys=ssh_keys)
     print("Droplet created...\n")
     print('Waiting to get IPPADDR of the droplet... ')
-    i = 0
-    while not droplet.publicIp4:
-        time.sleep(5)
-        i += 1
-        print(f'{i}')
-        droplet = Droplet.objects().get(droplet['id'])
+    with span('create_droplet.wait_for_ip'):
+        for delay in backoff(IP_DEADLINE):
+            if droplet.publicIp4:
+                break
+            time.sleep(delay)
+            droplet = Droplet.objects().get(droplet['id'])
+    if not droplet.publicIp4:
+        raise DropletNotReady(f'Droplet {droplet.name} got no public IP within {IP_DEADLINE}s')
     return droplet
 
 
@@ -329,7 +480,9 @@ def import_ssh_key():
         }
     ]
     ans = prompt(ques)
-    return doctl.compute.ssh_key._import(ans['name'], ans['keyfile'])
+    key = doctl.compute.ssh_key._import(ans['name'], ans['keyfile'])
+    catalog.invalidate('ssh_keys')
+    return key
 
 
 def select_ssh_keys(sshkeys, selectedKeys=[]):
@@ -358,11 +511,15 @@ def select_ssh_keys(sshkeys, selectedKeys=[]):
     return ans['keys']
 
 
+def list_ssh_keys():
+    return catalog.get('ssh_keys', doctl.compute.ssh_key.list, SSH_KEYS_TTL)
+
+
 def get_ssh_keys():
     sshkeyselected = []
 
     while True:
-        sshkeysall = doctl.compute.ssh_key.list()
+        sshkeysall = prefetch.take('ssh_keys', list_ssh_keys)
         ans = select_ssh_keys(sshkeysall, sshkeyselected)
         if ans == 'import':
             sshkeyselected += [import_ssh_key()]
@@ -374,5 +531,31 @@ def get_ssh_keys():
             sshkeyselected += [ans]
 
 
+def start_prefetch():
+    return prefetch.start({
+        'Droplet': Droplet.objects()._fetch,
+        'Image': Image.objects()._fetch,
+        'Region': Region.objects()._fetch,
+        'Size': Size.objects()._fetch,
+        'ssh_keys': list_ssh_keys,
+    })
+
+
+def main():
+    start_prefetch()
+    # imported here, components imports this module
+    from components import DjangoApp
+    try:
+        DjangoApp()
+    finally:
+        SSHConnections.close_all()
+        prefetch.report()
+        print(f'SFTP channels opened: {SFTPPool.opens}')
+        tracer.print_summary()
+        # not the cwd, which is usually the user's Django checkout
+        trace_dir = os.path.join(default_cache_dir(), 'traces')
+        print('Trace written to: ' + ', '.join(tracer.export(trace_dir)))
+
+
 if __name__ == "__main__":
     print(get_ssh_keys())
@@ -0,0 +1,75 @@
+import threading
+import weakref
+
+# Components register their DEFAULT_APT_PACKAGES with the AptPackages of
+# their ssh client. The first install() checks everything registered so far
+# with one dpkg-query and installs whatever is missing in one apt-get call.
+
+
+class AptPackages:
+    # skip apt-get update when the package index is younger than this
+    UPDATE_MAX_AGE_MINUTES = 6 * 60
+    QUERY_COMMAND = ("dpkg-query -W -f='${{Package}} ${{Status}}\\n' {packages} "
+                     "2>/dev/null || true")
+    INSTALL_COMMAND = (
+        "if ! find /var/lib/apt/lists -maxdepth 0 -mmin -{max_age} | grep -q .; "
+        "then sudo apt-get update; fi && "
+        "sudo DEBIAN_FRONTEND=noninteractive apt-get install -y {packages}"
+    )
+    FORCE_INSTALL_COMMAND = (
+        "sudo apt-get update && "
+        "sudo DEBIAN_FRONTEND=noninteractive apt-get install -y {packages}"
+    )
+
+    _managers = weakref.WeakKeyDictionary()
+    _managers_lock = threading.Lock()
+
+    def __init__(self, client) -> None:
+        self.client = client
+        self.required = []
+        self.installed = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_client(cls, client):
+        with cls._managers_lock:
+            manager = cls._managers.get(client)
+            if manager is None:
+                manager = cls(client)
+                cls._managers[client] = manager
+            return manager
+
+    def require(self, packages):
+        for package in packages:
+            if package not in self.required:
+                self.required.append(package)
+
+    def install(self, force=False):
+        # imported here, components imports this module
+        from components import Command
+        with self._lock:
+            if force:
+                self.installed.clear()
+            missing = [pkg for pkg in self.required if pkg not in self.installed]
+            if not missing:
+                return
+            if not force:
+                self.installed |= self._query_installed(missing, Command)
+                missing = [pkg for pkg in missing if pkg not in self.installed]
+                if not missing:
+                    print(f'apt packages {", ".join(self.required)} already installed...')
+                    return
+            template = self.FORCE_INSTALL_COMMAND if force else self.INSTALL_COMMAND
+            Command(template).exec(self.client, force=True, packages=' '.join(missing),
+                                   max_age=self.UPDATE_MAX_AGE_MINUTES)
+            self.installed |= set(missing)
+
+    def _query_installed(self, packages, Command):
+        cmd = Command(self.QUERY_COMMAND)
+        cmd.exec(self.client, force=True, packages=' '.join(packages))
+        installed = set()
+        for line in cmd.stdout.splitlines():
+            package, _, status = line.partition(' ')
+            if status.endswith(' installed'):
+                installed.add(package.split(':')[0])
+        return installed
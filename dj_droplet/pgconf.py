@@ -0,0 +1,84 @@
+import difflib
+import io
+import json
+import threading
+import weakref
+
+from pgtoolkit import conf as pgconf
+
+from remote import SFTPPool
+from timing import span
+
+# Components edit the cluster's postgresql.conf through the PostgresConf of
+# their ssh client. update() only rewrites settings whose value differs, so
+# re-running a setup leaves an up to date file untouched.
+
+
+class PostgresConf:
+    # changing these needs a server restart, the rest are picked up by a reload
+    RESTART_SETTINGS = {
+        'shared_buffers', 'max_connections', 'wal_buffers', 'wal_level',
+        'max_worker_processes', 'archive_mode', 'unix_socket_directories',
+        'listen_addresses', 'port',
+    }
+
+    _confs = weakref.WeakKeyDictionary()
+    _confs_lock = threading.Lock()
+
+    def __init__(self, client) -> None:
+        self.client = client
+        self._path = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_client(cls, client):
+        with cls._confs_lock:
+            conf = cls._confs.get(client)
+            if conf is None:
+                conf = cls(client)
+                cls._confs[client] = conf
+            return conf
+
+    @property
+    def path(self):
+        if self._path is None:
+            # imported here, components imports this module
+            from components import Command
+            cmd = Command('pg_lsclusters --json')
+            cmd.exec(self.client, force=True)
+            self._path = json.loads(cmd.stdout)[0]['configdir'] + '/postgresql.conf'
+        return self._path
+
+    def update(self, settings):
+        """ Set the given settings, prints a diff and returns the names of
+        the ones that changed """
+        with self._lock, span('PostgresConf.update', 'remote'):
+            sftp = SFTPPool.get(self.client)
+            with sftp.open(self.path, 'r') as fo:
+                old = fo.read().decode('utf-8')
+            conf = pgconf.parse(io.StringIO(old))
+            current = conf.as_dict()
+            changed = set()
+            for name, value in settings.items():
+                if name not in current or str(current[name]) != str(value):
+                    conf[name] = value
+                    changed.add(name)
+            if not changed:
+                return changed
+            out = io.StringIO()
+            conf.save(out)
+            new = out.getvalue()
+            print(''.join(difflib.unified_diff(
+                old.splitlines(True), new.splitlines(True),
+                fromfile=self.path, tofile=self.path)))
+            with sftp.open(self.path, 'w') as fo:
+                fo.write(new)
+            return changed
+
+    def apply(self, changed):
+        """ Reload postgres, or restart it if a restart-only setting changed """
+        if not changed:
+            return
+        from components import Command
+        action = 'restart' if changed & self.RESTART_SETTINGS else 'reload'
+        Command(f'systemctl {action} postgresql').exec(self.client, force=True)
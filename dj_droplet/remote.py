@@ -0,0 +1,137 @@
+import atexit
+import socket
+import threading
+import time
+import weakref
+
+import paramiko
+
+# seconds a new droplet gets to answer on its ssh port, and then to accept
+# our key
+SSH_READY_DEADLINE = 300
+SSH_AUTH_DEADLINE = 120
+
+
+class DropletNotReady(Exception):
+    pass
+
+
+def backoff(deadline, initial=1.0, factor=2.0, maximum=10.0):
+    """ Yields exponentially growing delays until `deadline` seconds have
+    passed, the last delay ends at the deadline """
+    end = time.time() + deadline
+    delay = initial
+    while True:
+        remaining = end - time.time()
+        if remaining <= 0:
+            return
+        yield min(delay, remaining)
+        delay = min(delay * factor, maximum)
+
+
+def probe_ssh(host, port=22, timeout=5):
+    """ True once sshd on host accepts a connection and sends its banner """
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as sock:
+            return sock.recv(256).startswith(b'SSH-')
+    except OSError:
+        return False
+
+
+def wait_for_ssh(host, port=22, deadline=SSH_READY_DEADLINE):
+    if probe_ssh(host, port):
+        return
+    for delay in backoff(deadline):
+        time.sleep(delay)
+        if probe_ssh(host, port):
+            return
+    raise DropletNotReady(f'{host}:{port} sent no ssh banner within {deadline}s')
+
+
+class SSHConnections:
+    """ Process wide registry of ssh clients keyed by (host, user).
+    Clients are reconnected in place when their transport drops, so every
+    component holding a client keeps working with the same object. """
+
+    KEEPALIVE_INTERVAL = 30
+
+    _clients = {}
+    _keys = weakref.WeakKeyDictionary()
+    _lock = threading.RLock()
+
+    @classmethod
+    def get(cls, host, user='root'):
+        with cls._lock:
+            client = cls._clients.get((host, user))
+            if client is None:
+                client = paramiko.SSHClient()
+                client.load_system_host_keys()
+                client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+                cls._connect(client, host, user)
+                cls._clients[(host, user)] = client
+                cls._keys[client] = (host, user)
+            else:
+                cls.revive(client)
+            return client
+
+    @classmethod
+    def revive(cls, client):
+        """ Reconnect a registered client if its transport is gone """
+        transport = client.get_transport()
+        if transport is not None and transport.is_active():
+            return client
+        with cls._lock:
+            key = cls._keys.get(client)
+            transport = client.get_transport()
+            if key is not None and (transport is None or not transport.is_active()):
+                cls._connect(client, *key)
+        return client
+
+    @classmethod
+    def _connect(cls, client, host, user):
+        client.connect(hostname=host, username=user)
+        client.get_transport().set_keepalive(cls.KEEPALIVE_INTERVAL)
+
+    @classmethod
+    def close_all(cls):
+        with cls._lock:
+            clients = list(cls._clients.values())
+            cls._clients.clear()
+        for client in clients:
+            SFTPPool.close(client)
+            client.close()
+
+
+class SFTPPool:
+    """ One long-lived SFTP session per paramiko SSHClient """
+
+    _sessions = weakref.WeakKeyDictionary()
+    _lock = threading.Lock()
+    opens = 0
+
+    @classmethod
+    def get(cls, client):
+        with cls._lock:
+            sftp = cls._sessions.get(client)
+            if sftp is None or sftp.get_channel().closed:
+                SSHConnections.revive(client)
+                sftp = client.open_sftp()
+                cls.opens += 1
+                cls._sessions[client] = sftp
+            return sftp
+
+    @classmethod
+    def close(cls, client):
+        with cls._lock:
+            sftp = cls._sessions.pop(client, None)
+        if sftp is not None:
+            sftp.close()
+
+    @classmethod
+    def close_all(cls):
+        for client in list(cls._sessions.keys()):
+            cls.close(client)
+
+
+atexit.register(SSHConnections.close_all)
+atexit.register(SFTPPool.close_all)
@@ -0,0 +1,128 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class CyclicDependency(Exception):
+    pass
+
+
+class UnknownDependency(Exception):
+    pass
+
+
+class Step:
+    """ A named setup command and the names of the steps it runs after """
+
+    def __init__(self, name, cmd, after=()) -> None:
+        self.name, self.cmd, self.after = name, cmd, tuple(after)
+
+    def __repr__(self) -> str:
+        return f'Step({self.name!r})'
+
+
+class DagScheduler:
+    """ Run steps as soon as all of their prerequisites are done """
+
+    def __init__(self, steps, max_workers=8, tracer=None) -> None:
+        self.steps = {step.name: step for step in steps}
+        self.max_workers = max_workers
+        self.tracer = tracer
+        self.durations = {}
+        self._order = self._topological_order()
+
+    def _topological_order(self):
+        pending = {}
+        for step in self.steps.values():
+            for name in step.after:
+                if name not in self.steps:
+                    raise UnknownDependency(
+                        f'Step {step.name} depends on unknown step {name}')
+            pending[step.name] = len(step.after)
+        ready = [name for name, count in pending.items() if count == 0]
+        order = []
+        while ready:
+            name = ready.pop(0)
+            order.append(name)
+            for dependent in self._dependents(name):
+                pending[dependent] -= 1
+                if pending[dependent] == 0:
+                    ready.append(dependent)
+        if len(order) != len(self.steps):
+            cycle = [name for name in self.steps if name not in order]
+            raise CyclicDependency(f'Steps {cycle} depend on each other')
+        return order
+
+    def _dependents(self, name):
+        return [step.name for step in self.steps.values() if name in step.after]
+
+    def ordered_steps(self):
+        return [self.steps[name] for name in self._order]
+
+    def run(self, func):
+        """ Call func(step) for every step, concurrently where possible.
+        The first exception stops scheduling and is re-raised once the
+        running steps have finished. """
+        pending = {name: len(step.after) for name, step in self.steps.items()}
+        running = {}
+        error = None
+        parent = self.tracer.current() if self.tracer else None
+
+        def timed(step):
+            start = time.time()
+            try:
+                if self.tracer is None:
+                    return func(step)
+                with self.tracer.adopt(parent), self.tracer.span(f'step {step.name}'):
+                    return func(step)
+            finally:
+                self.durations[step.name] = time.time() - start
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            def submit_ready():
+                for name in self._order:
+                    if pending[name] == 0:
+                        pending[name] = -1
+                        step = self.steps[name]
+                        running[executor.submit(timed, step)] = step
+
+            submit_ready()
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step = running.pop(future)
+                    if future.exception() is not None:
+                        error = error or future.exception()
+                        continue
+                    for dependent in self._dependents(step.name):
+                        pending[dependent] -= 1
+                if error is None:
+                    submit_ready()
+        if error is not None:
+            raise error
+
+    def critical_path(self):
+        """ Returns:
+            (List: step names of the longest chain, Float: its duration)
+        """
+        finish, previous = {}, {}
+        for name in self._order:
+            start = 0.0
+            for dep in self.steps[name].after:
+                if finish[dep] > start:
+                    start, previous[name] = finish[dep], dep
+            finish[name] = start + self.durations.get(name, 0.0)
+        if not finish:
+            return [], 0.0
+        name = max(finish, key=finish.get)
+        total = finish[name]
+        path = [name]
+        while name in previous:
+            name = previous[name]
+            path.append(name)
+        return path[::-1], total
+
+    def report(self):
+        path, total = self.critical_path()
+        step_time = sum(self.durations.values())
+        print(f'Critical path ({total:.1f}s of {step_time:.1f}s step time): '
+              + ' -> '.join(path))
@@ -0,0 +1,100 @@
+import pickle
+import posixpath
+import threading
+import weakref
+
+from remote import SFTPPool
+from timing import span
+
+# The state index keeps the pickled state of every Command executed on a
+# droplet in a single file under Component.CONFIG_DIR. It is read once per
+# ssh client, queried in memory and written back in one go by flush().
+
+
+class StateIndex:
+    FILE_NAME = 'state.index'
+    LEGACY_SUFFIX = '.Command'
+
+    _indexes = weakref.WeakKeyDictionary()
+    _indexes_lock = threading.Lock()
+
+    def __init__(self, client, config_dir) -> None:
+        self.client = client
+        self.config_dir = config_dir
+        self.path = posixpath.join(config_dir, self.FILE_NAME)
+        self._entries = None
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    @classmethod
+    def for_client(cls, client, config_dir):
+        with cls._indexes_lock:
+            index = cls._indexes.get(client)
+            if index is None:
+                index = cls(client, config_dir)
+                cls._indexes[client] = index
+            return index
+
+    def load(self):
+        with self._lock:
+            if self._entries is not None:
+                return
+            with span('StateIndex.load', 'remote'):
+                sftp = SFTPPool.get(self.client)
+                try:
+                    with sftp.open(self.path, 'r') as file:
+                        self._entries = pickle.load(file)
+                except IOError:
+                    self._entries = self._load_legacy(sftp)
+                    self._dirty = bool(self._entries)
+
+    def _load_legacy(self, sftp):
+        """ Import the per command dump files written by older versions """
+        entries = {}
+        try:
+            names = sftp.listdir(self.config_dir)
+        except IOError:
+            return entries
+        for name in names:
+            if not name.endswith(self.LEGACY_SUFFIX):
+                continue
+            with sftp.open(posixpath.join(self.config_dir, name), 'r') as file:
+                entries[name] = file.read()
+        return entries
+
+    def get(self, key):
+        self.load()
+        with self._lock:
+            data = self._entries.get(key)
+        if data is None:
+            return None
+        return pickle.loads(data)
+
+    def set(self, key, obj):
+        self.load()
+        data = pickle.dumps(obj)
+        with self._lock:
+            if self._entries.get(key) != data:
+                self._entries[key] = data
+                self._dirty = True
+
+    def __contains__(self, key):
+        self.load()
+        return key in self._entries
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            tmp_path = self.path + '.tmp'
+            with span('StateIndex.flush', 'remote'):
+                sftp = SFTPPool.get(self.client)
+                try:
+                    file = sftp.open(tmp_path, 'w')
+                except IOError:
+                    sftp.mkdir(self.config_dir)
+                    file = sftp.open(tmp_path, 'w')
+                with file:
+                    file.write(pickle.dumps(self._entries))
+                sftp.posix_rename(tmp_path, self.path)
+            self._dirty = False
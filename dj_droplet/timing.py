@@ -0,0 +1,151 @@
+import contextlib
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+
+# Wall clock spans of a deploy run. Spans nest per thread, worker threads
+# adopt the span they were started from. The 'remote' category is time spent
+# waiting on the droplet (ssh/sftp), 'local' is everything else.
+
+
+class Tracer:
+    def __init__(self) -> None:
+        self.spans = []
+        self.origin = time.time()
+        self._ids = itertools.count(1)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def current(self):
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    @contextlib.contextmanager
+    def span(self, name, cat='local', **args):
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        record = {
+            'id': next(self._ids),
+            'parent': parent['id'] if parent else None,
+            'name': name,
+            'cat': cat,
+            'tid': threading.get_ident(),
+            'start': time.time(),
+            'args': args,
+        }
+        stack.append(record)
+        try:
+            yield record
+        finally:
+            record['end'] = time.time()
+            stack.pop()
+            with self._lock:
+                self.spans.append(record)
+
+    @contextlib.contextmanager
+    def adopt(self, parent):
+        """ Nest the spans of this thread under a span of another thread """
+        stack = self._stack()
+        if parent is not None:
+            stack.append(parent)
+        try:
+            yield
+        finally:
+            if parent is not None:
+                stack.pop()
+
+    def traced(self, name=None, cat='local'):
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name or func.__qualname__, cat):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _self_times(self):
+        children = {}
+        for span in self.spans:
+            duration = span['end'] - span['start']
+            children[span['parent']] = children.get(span['parent'], 0.0) + duration
+        return {span['id']: max(0.0, span['end'] - span['start'] - children.get(span['id'], 0.0))
+                for span in self.spans}
+
+    def to_json(self):
+        return [
+            {
+                'name': span['name'],
+                'cat': span['cat'],
+                'id': span['id'],
+                'parent': span['parent'],
+                'thread': span['tid'],
+                'start': span['start'] - self.origin,
+                'duration': span['end'] - span['start'],
+                'args': span['args'],
+            }
+            for span in sorted(self.spans, key=lambda span: span['start'])
+        ]
+
+    def to_chrome_trace(self):
+        return {
+            'traceEvents': [
+                {
+                    'name': span['name'],
+                    'cat': span['cat'],
+                    'ph': 'X',
+                    'ts': int((span['start'] - self.origin) * 1e6),
+                    'dur': int((span['end'] - span['start']) * 1e6),
+                    'pid': os.getpid(),
+                    'tid': span['tid'],
+                    'args': {key: str(value) for key, value in span['args'].items()},
+                }
+                for span in self.spans
+            ],
+            'displayTimeUnit': 'ms',
+        }
+
+    def export(self, directory, prefix='dj_droplet_trace'):
+        os.makedirs(directory, exist_ok=True)
+        json_path = os.path.join(directory, f'{prefix}.json')
+        chrome_path = os.path.join(directory, f'{prefix}.chrome.json')
+        with open(json_path, 'w') as fo:
+            json.dump(self.to_json(), fo, indent=1)
+        with open(chrome_path, 'w') as fo:
+            json.dump(self.to_chrome_trace(), fo)
+        return json_path, chrome_path
+
+    def summary(self):
+        self_times = self._self_times()
+        phases = {}
+        for span in self.spans:
+            phase = phases.setdefault(
+                span['name'], {'count': 0, 'total': 0.0, 'remote': 0.0, 'local': 0.0})
+            phase['count'] += 1
+            phase['total'] += span['end'] - span['start']
+            category = 'remote' if span['cat'] == 'remote' else 'local'
+            phase[category] += self_times[span['id']]
+        lines = [
+            f"{'phase' : <40} | {'count' : >6} | {'total s' : >9} | "
+            f"{'remote s' : >9} | {'local s' : >9}"
+        ]
+        for name, phase in sorted(phases.items(), key=lambda item: -item[1]['total']):
+            lines.append(
+                f"{name[:40] : <40} | {phase['count'] : >6} | {phase['total'] : >9.2f} | "
+                f"{phase['remote'] : >9.2f} | {phase['local'] : >9.2f}")
+        return '\n'.join(lines)
+
+    def print_summary(self):
+        print(self.summary())
+
+
+tracer = Tracer()
+span = tracer.span
+traced = tracer.traced
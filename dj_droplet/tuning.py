@@ -0,0 +1,185 @@
+import math
+
+# Service settings derived from the droplet's size. Everything here is a
+# pure function of (vcpus, memory in MB, ...) so templates can be rendered,
+# and re-rendered after a resize, without talking to the droplet.
+
+
+class GunicornProfile:
+    """ How an app spends its request time """
+    CPU = 'cpu'
+    IO = 'io'
+    ASGI = 'asgi'
+
+    CHOICES = (
+        {'name': 'CPU bound (sync workers)', 'value': CPU},
+        {'name': 'IO bound (threaded workers)', 'value': IO},
+        {'name': 'ASGI (uvicorn workers)', 'value': ASGI},
+    )
+
+
+class GunicornTuning:
+    # MB kept free for nginx, postgres, redis and the OS
+    RESERVED_MEMORY = 512
+    # rough resident size of one django worker and of each extra thread
+    WORKER_MEMORY = 120
+    THREAD_MEMORY = 10
+    THREADS_PER_WORKER = 4
+    MAX_REQUESTS = 1000
+    TIMEOUT = 30
+    GRACEFUL_TIMEOUT = 30
+
+    WORKER_CLASSES = {
+        GunicornProfile.CPU: 'sync',
+        GunicornProfile.IO: 'gthread',
+        GunicornProfile.ASGI: 'uvicorn.workers.UvicornWorker',
+    }
+
+    def __init__(self, vcpus, memory, profile=GunicornProfile.IO) -> None:
+        if profile not in self.WORKER_CLASSES:
+            raise ValueError(f'Unknown gunicorn profile {profile}')
+        self.vcpus, self.memory, self.profile = max(1, vcpus), memory, profile
+        self.worker_class = self.WORKER_CLASSES[profile]
+        self.threads = self.THREADS_PER_WORKER if profile == GunicornProfile.IO else 1
+        self.workers = min(self._cpu_workers(), self._memory_workers())
+        # recycle workers to bound leaks, jittered so they don't restart together
+        self.max_requests = self.MAX_REQUESTS
+        self.max_requests_jitter = self.MAX_REQUESTS // 10
+        self.timeout = self.TIMEOUT
+        self.graceful_timeout = self.GRACEFUL_TIMEOUT
+
+    def _cpu_workers(self):
+        if self.profile == GunicornProfile.CPU:
+            return 2 * self.vcpus + 1
+        # threads or the event loop overlap the waiting, one worker per core
+        # plus one keeps the cores busy
+        return self.vcpus + 1
+
+    def _memory_workers(self):
+        per_worker = self.WORKER_MEMORY + self.THREAD_MEMORY * (self.threads - 1)
+        available = max(0, int(self.memory or 0) - self.RESERVED_MEMORY)
+        return max(1, math.floor(available / per_worker))
+
+    @property
+    def args(self):
+        """ The gunicorn command line options """
+        args = (f'--workers {self.workers} --worker-class {self.worker_class} '
+                f'--max-requests {self.max_requests} '
+                f'--max-requests-jitter {self.max_requests_jitter} '
+                f'--timeout {self.timeout} --graceful-timeout {self.graceful_timeout}')
+        if self.threads > 1:
+            args += f' --threads {self.threads}'
+        return args
+
+    def __str__(self) -> str:
+        return (f'{self.workers} {self.worker_class} workers'
+                + (f' x {self.threads} threads' if self.threads > 1 else ''))
+
+
+class NginxProfile:
+    BALANCED = 'balanced'
+    HIGH_TRAFFIC = 'high_traffic'
+
+    CHOICES = (
+        {'name': 'Balanced', 'value': BALANCED},
+        {'name': 'High traffic (more connections, cheaper compression)', 'value': HIGH_TRAFFIC},
+    )
+
+
+class NginxTuning:
+    # idle upstream connections kept per nginx worker, at most
+    MAX_KEEPALIVE = {NginxProfile.BALANCED: 16, NginxProfile.HIGH_TRAFFIC: 64}
+
+    def __init__(self, vcpus, memory, profile=NginxProfile.BALANCED,
+                 upstream_connections=None) -> None:
+        if profile not in self.MAX_KEEPALIVE:
+            raise ValueError(f'Unknown nginx profile {profile}')
+        self.vcpus, self.memory, self.profile = max(1, vcpus), int(memory or 0), profile
+        high = profile == NginxProfile.HIGH_TRAFFIC
+        small = self.memory < 1024
+        self.worker_connections = (4096 if high else 1024) // (2 if small else 1)
+        # a proxied request holds a client and an upstream descriptor
+        self.worker_rlimit_nofile = 2 * self.worker_connections
+        self.gzip_comp_level = 3 if high else 5
+        self.open_file_cache = 1000 if small or not high else 10000
+        # more idle connections than gunicorn can serve at once are useless
+        self.keepalive = max(2, min(upstream_connections or self.MAX_KEEPALIVE[profile],
+                                    self.MAX_KEEPALIVE[profile]))
+        # buffer whole responses so slow clients don't hold a gunicorn worker
+        buffer = '16k' if high and not small else '8k'
+        self.proxy_buffer_size = buffer
+        self.proxy_buffers = f'{16 if high else 8} {buffer}'
+        self.proxy_busy_buffers_size = '32k' if buffer == '16k' else '16k'
+
+
+class MicroCacheTuning:
+    # one MB of keys zone holds about 8000 keys
+    MAX_KEYS_ZONE = 64
+    MIN_MAX_SIZE, MAX_MAX_SIZE = 100, 1024
+    # share of the disk the cached responses may use
+    DISK_FRACTION = 0.02
+
+    def __init__(self, memory, disk) -> None:
+        self.memory, self.disk = int(memory or 0), int(disk or 0)
+        self.keys_zone = max(1, min(self.MAX_KEYS_ZONE, self.memory // 256))
+        max_size = int(self.disk * 1024 * self.DISK_FRACTION)
+        self.max_size = max(self.MIN_MAX_SIZE, min(self.MAX_MAX_SIZE, max_size))
+
+
+class PostgresTuning:
+    """ pgtune's web application profile """
+    MAX_CONNECTIONS = 100
+
+    def __init__(self, vcpus, memory, disk_type='ssd', max_connections=None) -> None:
+        self.vcpus, self.memory = max(1, vcpus), int(memory or 0)
+        self.disk_type = disk_type
+        self.max_connections = max_connections or self.MAX_CONNECTIONS
+
+    @property
+    def settings(self):
+        memory_kb = self.memory * 1024
+        shared_buffers = memory_kb // 4
+        # pgtune: 3% of shared_buffers, 16MB once that exceeds it
+        wal_buffers = min(16 * 1024, max(64, shared_buffers * 3 // 100))
+        parallel = max(1, min(4, (self.vcpus + 1) // 2))
+        work_mem = max(64, (memory_kb - shared_buffers) // (self.max_connections * 3) // parallel)
+        ssd = self.disk_type == 'ssd'
+        settings = {
+            'max_connections': self.max_connections,
+            'shared_buffers': _kb(shared_buffers),
+            'effective_cache_size': _kb(memory_kb * 3 // 4),
+            'maintenance_work_mem': _kb(min(2 * 1024 * 1024, memory_kb // 16)),
+            'work_mem': _kb(work_mem),
+            'wal_buffers': _kb(wal_buffers),
+            'min_wal_size': '1GB',
+            'max_wal_size': '4GB',
+            'checkpoint_completion_target': 0.9,
+            'default_statistics_target': 100,
+            'random_page_cost': 1.1 if ssd else 4,
+            'effective_io_concurrency': 200 if ssd else 2,
+        }
+        if self.vcpus >= 4:
+            settings.update({
+                'max_worker_processes': self.vcpus,
+                'max_parallel_workers_per_gather': parallel,
+                'max_parallel_workers': self.vcpus,
+                'max_parallel_maintenance_workers': parallel,
+            })
+        return settings
+
+
+def _kb(value):
+    """ Postgres memory units, whole MB where possible """
+    if value >= 1024 and value % 1024 == 0:
+        return f'{value // 1024}MB'
+    return f'{value}kB'
+
+
+class RedisTuning:
+    # a cache next to postgres and the app gets a quarter of the RAM
+    MEMORY_FRACTION = 0.25
+    MIN_MEMORY = 32
+
+    def __init__(self, memory) -> None:
+        self.memory = int(memory or 0)
+        self.maxmemory = max(self.MIN_MEMORY, int(self.memory * self.MEMORY_FRACTION))
@@ -14,6 +14,8 @@ from examples import custom_style_1, custom_style_2, custom_style_3
 from git.exc import GitCommandError, InvalidGitRepositoryError
 from PyInquirer import Separator, prompt
 
+from timing import traced
+
 logger = logging.getLogger(__name__)
 
 EXCLUDE = ['.git', '__pycache__', 'templates', 'static', 'node_modules']
@@ -30,14 +32,77 @@ def find(name, path):
 
 
 def get_wsgi_app(path):
-    wsgipath = find('wsgi.py', path)
-    if not wsgipath:
+    return _get_app(path, 'wsgi.py')
+
+
+def get_asgi_app(path):
+    return _get_app(path, 'asgi.py')
+
+
+def _get_app(path, filename):
+    apppath = find(filename, path)
+    if not apppath:
         return
-    wsgiapp = wsgipath.replace(path, '', 1).replace(
+    app = apppath.replace(path, '', 1).replace(
         '.py', '').replace('/', '.')
-    while wsgiapp.startswith("."):
-        wsgiapp = wsgiapp[1:]
-    return wsgiapp+':application'
+    while app.startswith("."):
+        app = app[1:]
+    return app+':application'
+
+
+class OutputBuffer:
+    """ Keeps the last `limit` bytes written to it and passes every complete
+    line, or the last `limit` bytes of longer ones, to on_line as it arrives """
+
+    def __init__(self, limit, on_line=None) -> None:
+        self.limit, self.on_line = limit, on_line
+        self._chunks = collections.deque()
+        self._size = 0
+        # the unfinished last line, as chunks, also cut to `limit` bytes
+        self._partial = collections.deque()
+        self._partial_size = 0
+
+    def feed(self, data):
+        if not data:
+            return
+        self._chunks.append(data)
+        self._size += len(data)
+        while self._chunks and self._size - len(self._chunks[0]) >= self.limit:
+            self._size -= len(self._chunks.popleft())
+        if self.on_line is not None:
+            self._feed_lines(data)
+
+    def _feed_lines(self, data):
+        first, *lines = data.split(b'\n')
+        self._partial.append(first)
+        self._partial_size += len(first)
+        if not lines:
+            while self._partial and self._partial_size - len(self._partial[0]) >= self.limit:
+                self._partial_size -= len(self._partial.popleft())
+            return
+        *lines, rest = lines
+        self._emit_partial()
+        for line in lines:
+            self.on_line(line[-self.limit:].decode('utf-8', errors='replace'))
+        if rest:
+            self._partial.append(rest)
+            self._partial_size = len(rest)
+
+    def _emit_partial(self):
+        line = b''.join(self._partial)[-self.limit:]
+        self._partial.clear()
+        self._partial_size = 0
+        self.on_line(line.decode('utf-8', errors='replace'))
+
+    def close(self):
+        if self.on_line is not None and self._partial_size:
+            self._emit_partial()
+        self._partial.clear()
+        self._partial_size = 0
+
+    def getvalue(self):
+        data = b''.join(self._chunks)[-self.limit:]
+        return data.decode('utf-8', errors='replace')
 
 
 def hash_string(string):
@@ -251,6 +316,7 @@ def _is_repo_public(repo):
     return res.status_code == 200
 
 
+@traced('GitHub.clone')
 def _clone_from(repo, working_dir, token=None):
     url = _make_github_url(repo, token)
     try:
@@ -0,0 +1,421 @@
+""" An in-process stand-in for a droplet's sshd.
+
+FakeSSHServer accepts any password or public key, answers exec requests
+through a configurable executor and serves SFTP from a temporary directory.
+Every exec request and SFTP operation can be delayed by `latency` seconds to
+emulate a WAN round trip. The server counts channel opens, exec requests,
+SFTP operations and bytes on the wire.
+"""
+import fnmatch
+import json
+import os
+import re
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+
+import paramiko
+
+
+class Counters:
+    FIELDS = ('connections', 'channel_opens', 'execs', 'sftp_ops',
+              'bytes_sent', 'bytes_received')
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            for field in self.FIELDS:
+                setattr(self, field, 0)
+
+    def add(self, field, value=1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + value)
+
+    @property
+    def round_trips(self):
+        return self.execs + self.sftp_ops
+
+    def as_dict(self):
+        data = {field: getattr(self, field) for field in self.FIELDS}
+        data['round_trips'] = self.round_trips
+        return data
+
+
+class FakeShell:
+    """ Answers commands from a list of (regex, handler) rules, the first
+    matching rule wins. handler(match, server) returns
+    (exit_status, stdout, stderr). Unmatched commands succeed silently. """
+
+    def __init__(self, rules=None) -> None:
+        self.rules = list(rules or []) + self.default_rules()
+        self.history = []
+        self.packages = set()
+        # the fake repo: its branch head, the files changed by the last
+        # commit and the venv key its requirements hash to
+        self.head = '0' * 40
+        self.changed = []
+        self.venv = 'venv'
+        # the release `current` points at
+        self.current = ''
+
+    def default_rules(self):
+        return [
+            (r'^pg_lsclusters --json$', lambda match, server: (
+                0, json.dumps([{'configdir': '/etc/postgresql/14/main'}]) + '\n', '')),
+            (r'^cd (\S+) && ls \*\.(\w+)$', self._ls),
+            (r'^dpkg-query -W .*? ((?:[\w.+-]+ )+)2>/dev/null', self._dpkg_query),
+            (r'apt-get install -y (.*)$', self._apt_install),
+            (r"<<'FETCH_RELEASE'", lambda match, server: (
+                0, f'current={self.current}\nnew={self.head}\n', '')),
+            (r'git -C \S+ diff --name-only ', lambda match, server: (
+                0, ''.join(f'{path}\n' for path in self.changed), '')),
+            (r"<<'BUILD_RELEASE'\nset -e\nRELEASE=(/\S+)/releases/(\w+)\n", self._build),
+            (r'ln -sfn \S+/releases/(\w+) ', self._activate),
+            # release scripts that only move files around run for real
+            (r"<<'(PREVIOUS_RELEASE|PRUNE_RELEASES)'|^sudo -H -u \S+ cp -al ", self._local),
+            (r'\bmkdir -p ((?:/[^\s&;]+ ?)+)', self._mkdir),
+        ]
+
+    def _build(self, match, server):
+        home, sha = match.group(1), match.group(2)
+        current = server.local_path(f'{home}/current/venv')
+        previous_venv = os.path.basename(os.readlink(current)) if os.path.islink(current) else ''
+        os.makedirs(server.local_path(f'{home}/venvs/{self.venv}'), exist_ok=True)
+        release = server.local_path(f'{home}/releases/{sha}')
+        os.makedirs(release, exist_ok=True)
+        if not os.path.islink(os.path.join(release, 'venv')):
+            os.symlink(f'{home}/venvs/{self.venv}', os.path.join(release, 'venv'))
+        return 0, f'previous_venv={previous_venv}\nvenv={self.venv}\n', ''
+
+    def _activate(self, match, server):
+        self.current = match.group(1)
+        return self._local(match, server)
+
+    @staticmethod
+    def _local(match, server):
+        """ Runs the command with bash, with /home inside the server's root """
+        command = re.sub(r'^sudo -H -u \S+ ', '', match.string)
+        command = re.sub(r'(?<![\w.])/home/', server.local_path('/home') + '/', command)
+        return LocalShell()(command, b'', server)
+
+    @staticmethod
+    def _mkdir(match, server):
+        for path in match.group(1).split():
+            os.makedirs(server.local_path(path), exist_ok=True)
+        return 0, '', ''
+
+    def _dpkg_query(self, match, server):
+        return 0, ''.join(f'{pkg} install ok installed\n' for pkg in match.group(1).split()
+                          if pkg in self.packages), ''
+
+    def _apt_install(self, match, server):
+        self.packages.update(match.group(1).split())
+        return 0, '', ''
+
+    @staticmethod
+    def _ls(match, server):
+        directory = server.local_path(match.group(1))
+        names = sorted(fnmatch.filter(os.listdir(directory), f'*.{match.group(2)}')) \
+            if os.path.isdir(directory) else []
+        if not names:
+            return 2, '', f'ls: cannot access \'*.{match.group(2)}\': No such file or directory\n'
+        return 0, '\n'.join(names) + '\n', ''
+
+    def __call__(self, command, stdin, server):
+        if command.strip() == 'bash -s':
+            return self._run_script(stdin.decode('utf-8'), server)
+        return self.run(command, server)
+
+    def run(self, command, server):
+        self.history.append(command)
+        for pattern, handler in self.rules:
+            match = re.search(pattern, command)
+            if match:
+                return handler(match, server)
+        return 0, '', ''
+
+    def _run_script(self, script, server):
+        """ Emulate the step scripts of CommandBatch: run every subshell
+        block through run() and echo its framing markers """
+        out, err = [], []
+        block = re.compile(
+            r"^echo '(?P<marker>[^']+) begin (?P<index>\d+)'.*?\n\(\n(?P<cmd>.*?)\n\) </dev/null$",
+            re.MULTILINE | re.DOTALL)
+        for match in block.finditer(script):
+            marker, index = match.group('marker'), match.group('index')
+            out.append(f'{marker} begin {index}\n')
+            err.append(f'{marker} begin {index}\n')
+            status, stdout, stderr = self.run(match.group('cmd'), server)
+            out += [stdout, f'{marker} end {index} {status}\n']
+            err += [stderr, f'{marker} end {index} {status}\n']
+            if status != 0:
+                return status, ''.join(out), ''.join(err)
+        return 0, ''.join(out), ''.join(err)
+
+
+class LocalShell:
+    """ Runs commands for real with bash, inside the server's root dir """
+
+    def __call__(self, command, stdin, server):
+        proc = subprocess.run(['bash', '-c', command], input=stdin, cwd=server.root,
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        return (proc.returncode, proc.stdout.decode('utf-8', errors='replace'),
+                proc.stderr.decode('utf-8', errors='replace'))
+
+
+class _CountingSocket:
+    def __init__(self, sock, counters) -> None:
+        self._sock, self._counters = sock, counters
+
+    def send(self, data):
+        sent = self._sock.send(data)
+        self._counters.add('bytes_sent', sent)
+        return sent
+
+    def recv(self, size):
+        data = self._sock.recv(size)
+        self._counters.add('bytes_received', len(data))
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
+
+class _ServerInterface(paramiko.ServerInterface):
+    def __init__(self, fake) -> None:
+        self.fake = fake
+        self.pending = {}
+
+    def get_allowed_auths(self, username):
+        return 'password,publickey'
+
+    def check_auth_password(self, username, password):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_auth_publickey(self, username, key):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_request(self, kind, chanid):
+        if kind != 'session':
+            return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+        self.fake.counters.add('channel_opens')
+        return paramiko.OPEN_SUCCEEDED
+
+    def check_channel_exec_request(self, channel, command):
+        # started by _handle_channel_request once the request is acknowledged,
+        # a command that finishes first would close the channel before the
+        # client saw its reply
+        self.pending[channel.get_id()] = threading.Thread(
+            target=self.fake._exec, args=(channel, command.decode('utf-8')), daemon=True)
+        return True
+
+
+def _handle_channel_request(channel, m):
+    paramiko.Channel._handle_request(channel, m)
+    thread = channel.transport.server_object.pending.pop(channel.get_id(), None)
+    if thread is not None:
+        thread.start()
+
+
+class _Transport(paramiko.Transport):
+    _channel_handler_table = dict(paramiko.Transport._channel_handler_table)
+    _channel_handler_table[paramiko.common.MSG_CHANNEL_REQUEST] = _handle_channel_request
+
+
+class _SFTPHandle(paramiko.SFTPHandle):
+    def stat(self):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+
+class _SFTPServer(paramiko.SFTPServerInterface):
+    def __init__(self, server, *args, **kwargs) -> None:
+        super().__init__(server, *args, **kwargs)
+        self.fake = server.fake
+
+    def _op(self):
+        self.fake.counters.add('sftp_ops')
+        if self.fake.latency:
+            time.sleep(self.fake.latency)
+
+    def canonicalize(self, path):
+        return path if path.startswith('/') else '/' + path
+
+    def list_folder(self, path):
+        self._op()
+        local = self.fake.local_path(path)
+        try:
+            entries = []
+            for name in os.listdir(local):
+                attr = paramiko.SFTPAttributes.from_stat(os.stat(os.path.join(local, name)))
+                attr.filename = name
+                entries.append(attr)
+            return entries
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def stat(self, path):
+        self._op()
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.stat(self.fake.local_path(path)))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    lstat = stat
+
+    def open(self, path, flags, attr):
+        self._op()
+        local = self.fake.local_path(path)
+        try:
+            fd = os.open(local, flags | getattr(os, 'O_BINARY', 0), 0o644)
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        if flags & os.O_WRONLY:
+            mode = 'ab' if flags & os.O_APPEND else 'wb'
+        elif flags & os.O_RDWR:
+            mode = 'a+b' if flags & os.O_APPEND else 'r+b'
+        else:
+            mode = 'rb'
+        fobj = os.fdopen(fd, mode)
+        handle = _SFTPHandle(flags)
+        handle.filename = local
+        handle.readfile = fobj
+        handle.writefile = fobj
+        return handle
+
+    def remove(self, path):
+        self._op()
+        try:
+            os.remove(self.fake.local_path(path))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+    def rename(self, oldpath, newpath):
+        self._op()
+        try:
+            os.rename(self.fake.local_path(oldpath), self.fake.local_path(newpath))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+    posix_rename = rename
+
+    def mkdir(self, path, attr):
+        self._op()
+        try:
+            os.mkdir(self.fake.local_path(path))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+    def rmdir(self, path):
+        self._op()
+        try:
+            os.rmdir(self.fake.local_path(path))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+    def chattr(self, path, attr):
+        self._op()
+        return paramiko.SFTP_OK
+
+
+class FakeSSHServer:
+    _host_key = None
+
+    def __init__(self, executor=None, latency=0.0, root=None) -> None:
+        self.executor = executor or FakeShell()
+        self.latency = latency
+        self._tmpdir = None if root else tempfile.mkdtemp(prefix='fakessh-')
+        self.root = root or self._tmpdir
+        self.counters = Counters()
+        self._transports = []
+        self._sock = None
+
+    @classmethod
+    def host_key(cls):
+        if cls._host_key is None:
+            cls._host_key = paramiko.RSAKey.generate(2048)
+        return cls._host_key
+
+    def local_path(self, path):
+        """ Absolute remote paths live under root, relative ones in root too
+        (root doubles as the login user's home directory) """
+        return os.path.join(self.root, path.lstrip('/'))
+
+    def start(self):
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(('127.0.0.1', 0))
+        self._sock.listen(16)
+        self.port = self._sock.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+        return self
+
+    def _accept(self):
+        while True:
+            try:
+                sock, _ = self._sock.accept()
+            except OSError:
+                return
+            self.counters.add('connections')
+            transport = _Transport(_CountingSocket(sock, self.counters))
+            transport.add_server_key(self.host_key())
+            transport.set_subsystem_handler('sftp', paramiko.SFTPServer, _SFTPServer)
+            try:
+                transport.start_server(server=_ServerInterface(self))
+            except paramiko.SSHException:
+                # a port probe that hung up after the banner
+                transport.close()
+                continue
+            self._transports.append(transport)
+
+    def _exec(self, channel, command):
+        if self.latency:
+            time.sleep(self.latency)
+        self.counters.add('execs')
+        stdin = b''
+        if command.strip() == 'bash -s':
+            while True:
+                data = channel.recv(32768)
+                if not data:
+                    break
+                stdin += data
+        status, stdout, stderr = self.executor(command, stdin, self)
+        if stdout:
+            channel.sendall(stdout.encode('utf-8'))
+        if stderr:
+            channel.sendall_stderr(stderr.encode('utf-8'))
+        channel.send_exit_status(status)
+        channel.close()
+
+    def connect(self, user='root'):
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect('127.0.0.1', port=self.port, username=user, password='fake',
+                       look_for_keys=False, allow_agent=False)
+        return client
+
+    def stop(self):
+        if self._sock is not None:
+            self._sock.close()
+        for transport in self._transports:
+            transport.close()
+        if self._tmpdir:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
@@ -0,0 +1,63 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from dj_droplet.catalog import CatalogCache
+
+
+class CatalogCacheTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.cache = CatalogCache(self.directory, max_stale=60)
+        self.calls = 0
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def fetch(self):
+        self.calls += 1
+        return [{'slug': 'ams3', 'call': self.calls}]
+
+    def age(self, key, seconds):
+        path = os.path.join(self.directory, f'{key}.json')
+        with open(path) as fo:
+            entry = json.load(fo)
+        entry['fetched'] -= seconds
+        with open(path, 'w') as fo:
+            json.dump(entry, fo)
+
+    def test_fresh(self):
+        self.cache.get('regions', self.fetch, ttl=10)
+        data = self.cache.get('regions', self.fetch, ttl=10)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(data[0]['call'], 1)
+
+    def test_stale_while_revalidate(self):
+        self.cache.get('regions', self.fetch, ttl=10)
+        self.age('regions', 20)
+        data = self.cache.get('regions', self.fetch, ttl=10)
+        self.assertEqual(data[0]['call'], 1, msg='Stale data is served at once')
+        self.cache.wait()
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(self.cache.get('regions', self.fetch, ttl=10)[0]['call'], 2)
+
+    def test_expired(self):
+        self.cache.get('regions', self.fetch, ttl=10)
+        self.age('regions', 120)
+        self.assertEqual(self.cache.get('regions', self.fetch, ttl=10)[0]['call'], 2)
+
+    def test_invalidate(self):
+        self.cache.get('regions', self.fetch, ttl=10)
+        self.cache.get('sizes', self.fetch, ttl=10)
+        self.cache.invalidate('regions')
+        self.cache.get('regions', self.fetch, ttl=10)
+        self.assertEqual(self.calls, 3)
+        self.cache.invalidate()
+        self.cache.get('sizes', self.fetch, ttl=10)
+        self.assertEqual(self.calls, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
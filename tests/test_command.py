@@ -1,5 +1,5 @@
 import unittest
-from dj_droplet.components import Command, CmdException
+from dj_droplet.components import Command, CommandBatch, CmdException
 import paramiko
 import getpass
 
@@ -43,6 +43,31 @@ class CommandTestCase(unittest.TestCase):
         self.assertIn('not found', command1.stderr)
         self.assertTrue(command1.stdout == '')
 
+    def test_command_stream(self):
+        lines = []
+        command = Command('seq 1 {n}')
+        command.exec(self.ssh, force=True, n=200000,
+                     on_output=lambda line, name: lines.append(line))
+        self.assertTrue(command.is_done)
+        self.assertEqual(len(lines), 200000)
+        self.assertEqual(lines[-1], '200000')
+        self.assertLessEqual(len(command.stdout), Command.OUTPUT_LIMIT)
+        self.assertTrue(command.stdout.endswith('199999\n200000\n'))
+
+    def test_command_batch(self):
+        batch = CommandBatch([
+            'echo "{strng}" && echo err >&2', 'printf partial', 'sdalfdal', 'echo never'])
+        self.assertRaises(CmdException, batch.exec, self.ssh,
+                          force=True, strng='hello')
+        first, second, failing, last = batch.commands
+        self.assertTrue(first.is_done)
+        self.assertEqual(first.stdout, 'hello\n')
+        self.assertEqual(first.stderr, 'err\n')
+        self.assertEqual(second.stdout, 'partial')
+        self.assertTrue(failing.is_failed)
+        self.assertIn('not found', failing.stderr)
+        self.assertTrue(last.is_canceled)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,90 @@
+import contextlib
+import io
+import logging
+import os
+import sys
+import unittest
+
+# the deploy modules import each other as scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'dj_droplet'))
+
+from components import CmdException, Command, CommandBatch  # noqa: E402
+from remote import SFTPPool  # noqa: E402
+from state import StateIndex  # noqa: E402
+from tests.fakessh import FakeSSHServer, LocalShell  # noqa: E402
+from util import OutputBuffer  # noqa: E402
+
+# more than one read of the channel, with no newline in between
+LONG_LINE = 'head -c 100000 /dev/zero | tr "\\\\0" x'
+
+
+class OutputBufferTestCase(unittest.TestCase):
+    def test_lines(self):
+        lines = []
+        buffer = OutputBuffer(8, lines.append)
+        for chunk in (b'ab', b'c\nde', b'f', b'\n\nxyz', b'0123456789', b'abcdef\nq'):
+            buffer.feed(chunk)
+        buffer.close()
+        self.assertEqual(lines, ['abc', 'def', '', '89abcdef', 'q'])
+        self.assertEqual(buffer.getvalue(), 'abcdef\nq')
+
+    def test_no_limit_partial_line(self):
+        lines = []
+        buffer = OutputBuffer(0, lines.append)
+        buffer.feed(b'abc\n')
+        buffer.feed(b'progress 10%')
+        buffer.close()
+        self.assertEqual(lines, ['abc'])
+
+
+class CommandBatchTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        logging.getLogger('paramiko').setLevel(logging.CRITICAL)
+
+    def setUp(self) -> None:
+        self.server = FakeSSHServer(executor=LocalShell()).start()
+        self.addCleanup(self.server.stop)
+        self.client = self.server.connect()
+
+    def tearDown(self) -> None:
+        SFTPPool.close(self.client)
+        StateIndex._indexes.pop(self.client, None)
+        self.client.close()
+
+    def exec(self, runnable, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return runnable.exec(self.client, **kwargs)
+
+    def test_partial_lines(self):
+        lines = []
+        commands = [Command('printf partial'), Command(LONG_LINE), Command('echo done')]
+        self.exec(CommandBatch(commands), force=True,
+                  on_output=lambda line, name: lines.append(line))
+        self.assertEqual([cmd.exit_status for cmd in commands], [0, 0, 0])
+        self.assertEqual(commands[0].stdout, 'partial')
+        self.assertEqual(set(commands[1].stdout), {'x'})
+        self.assertGreater(len(commands[1].stdout), Command.OUTPUT_LIMIT // 2)
+        self.assertEqual(commands[2].stdout, 'done\n')
+        self.assertIn('done', lines)
+
+    def test_failing_step(self):
+        commands = [Command('printf partial'), Command('echo oops >&2; exit 3'),
+                    Command('echo never')]
+        with self.assertRaises(CmdException):
+            self.exec(CommandBatch(commands), force=True)
+        self.assertEqual(commands[1].exit_status, 3)
+        self.assertEqual(commands[1].stderr, 'oops\n')
+        self.assertTrue(commands[2].is_canceled)
+
+    def test_streamed_command(self):
+        lines = []
+        command = Command(LONG_LINE + '; echo; echo done')
+        self.exec(command, force=True, on_output=lambda line, name: lines.append(line))
+        self.assertEqual(lines[-1], 'done')
+        self.assertEqual(set(lines[0]), {'x'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import contextlib
+import io
+import logging
+import os
+import sys
+import time
+import unittest
+
+# the deploy modules import each other as scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'dj_droplet'))
+
+from components import CmdException, CommandBlock  # noqa: E402
+from remote import SFTPPool  # noqa: E402
+from state import StateIndex  # noqa: E402
+from tests.fakessh import FakeSSHServer, LocalShell  # noqa: E402
+
+
+class CommandBlockTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        logging.getLogger('paramiko').setLevel(logging.CRITICAL)
+
+    def setUp(self) -> None:
+        self.server = FakeSSHServer(executor=LocalShell()).start()
+        self.addCleanup(self.server.stop)
+        self.ssh = self.server.connect()
+
+    def tearDown(self) -> None:
+        SFTPPool.close(self.ssh)
+        StateIndex._indexes.pop(self.ssh, None)
+        self.ssh.close()
+
+    def test_CommandBlockParallel(self):
+        times = 5
+        cmd = 'echo {i} && date && sleep 1 && date'
+        cmdblk1 = CommandBlock(
+            name='parallel10sec',
+            commands=[cmd.format(i=i) for i in range(times)],
+            serial=False)
+        cmdblk2 = CommandBlock(
+            name='serial10sec',
+            commands=[cmd.format(i=i+times) for i in range(times)],
+            depend=cmdblk1)
+        self.assertRaises(CmdException, cmdblk2.exec, self.ssh)
+        st = time.time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            cmdblk1.exec(self.ssh, force=True)
+        cmdblk1.update_status()
+        et = time.time()
+        tt = et - st
+        self.assertTrue(cmdblk1.is_done)
+        for i, cmd in enumerate(cmdblk1.commands):
+            self.assertTrue(cmd.stdout.startswith(f'{i}\n'))
+        self.assertLess(
+            tt, times/2, msg='Parallel block should finish in < 2.5 seconds')
+        st = time.time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            cmdblk2.exec(self.ssh, force=True)
+        cmdblk2.update_status()
+        et = time.time()
+        tt = et - st
+        self.assertTrue(cmdblk2.is_done)
+        self.assertGreaterEqual(
+            tt, times, msg='Serial block should take >= 5 seconds')
+
+    def test_CommandBlockFailure(self):
+        cmdblk = CommandBlock(
+            name='failing', commands=['sdalfdal', 'echo never'])
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertRaises(CmdException, cmdblk.exec, self.ssh, force=True)
+        self.assertTrue(cmdblk.is_failed)
+        self.assertTrue(cmdblk.commands[0].is_failed)
+        self.assertTrue(cmdblk.commands[1].is_canceled)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+import contextlib
+import io
+import logging
+import os
+import pickle
+import sys
+import unittest
+from unittest import mock
+
+# the deploy modules import each other as scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'dj_droplet'))
+
+import components  # noqa: E402
+from droplet import Droplet  # noqa: E402
+from remote import SFTPPool  # noqa: E402
+from state import StateIndex  # noqa: E402
+from tests.fakessh import FakeShell, FakeSSHServer  # noqa: E402
+
+DROPLET = {
+    'id': 1, 'name': 'test', 'memory': 2048, 'vcpus': 2, 'disk': 50,
+    'size_slug': 's-2vcpu-2gb', 'region': {'slug': 'ams3'},
+    'image': {'slug': 'ubuntu-22-04-x64'},
+    'networks': {'v4': [{'type': 'public', 'ip_address': '127.0.0.1'}]},
+}
+
+
+class NewDropletTestCase(unittest.TestCase):
+    """ A component set up on a droplet created in the same run """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        logging.getLogger('paramiko').setLevel(logging.CRITICAL)
+
+    def setUp(self) -> None:
+        self.server = FakeSSHServer().start()
+        self.addCleanup(self.server.stop)
+        conf = self.server.local_path('/etc/postgresql/14/main/postgresql.conf')
+        os.makedirs(os.path.dirname(conf))
+        with open(conf, 'w') as fo:
+            fo.write('max_connections = 100\n')
+        self.clients = []
+
+    def tearDown(self) -> None:
+        for client in self.clients:
+            SFTPPool.close(client)
+            StateIndex._indexes.pop(client, None)
+            client.close()
+
+    def connect(self, ipaddr, user='root'):
+        client = self.server.connect(user)
+        self.clients.append(client)
+        return client
+
+    def test_nested_components(self):
+        answers = iter(['testdb', 'testuser'])
+        with mock.patch.object(components, 'choose_droplet',
+                               return_value=(Droplet(DROPLET), True)), \
+                mock.patch.object(components, 'wait_for_ssh'), \
+                mock.patch.object(components.SSHConnections, 'get', side_effect=self.connect), \
+                mock.patch.object(components.Component, '_get_input_from_user',
+                                  side_effect=lambda *args, **kwargs: next(answers)), \
+                mock.patch.object(components.Component, '_get_confirm_from_user',
+                                  return_value=True), \
+                contextlib.redirect_stdout(io.StringIO()):
+            db = components.DataBase()
+        self.assertTrue(db.initialized)
+        self.assertTrue(db.dbuser.initialized)
+        self.assertTrue(db.backup.initialized)
+        config_dir = self.server.local_path(components.Component.CONFIG_DIR)
+        self.assertIn('testuser.DataBaseUser', os.listdir(config_dir))
+        self.assertIn('testdb.DataBase', os.listdir(config_dir))
+
+
+class OptionalPackagesTestCase(unittest.TestCase):
+    """ The packages of every optional component are known to the first
+    apt run, which the first nested component triggers """
+
+    class Client:
+        pass
+
+    def test_one_apt_run(self):
+        app = components.DjangoApp.__new__(components.DjangoApp)
+        app.droplet, app._ssh = Droplet(DROPLET), self.Client()
+        packages = components.AptPackages.for_client(app._ssh)
+        required = {}
+        nested = (components.DataBase, components.PgBouncer, components.RedisCache,
+                  components.NginxMicroCache)
+
+        def init(component, parent):
+            required[type(component)] = set(packages.required)
+
+        patches = [mock.patch.object(cls, '__init__', init) for cls in nested]
+        patches += [
+            mock.patch.object(components.DataBase, 'url', 'postgres://db'),
+            mock.patch.object(components.PgBouncer, 'add_database',
+                              return_value='postgres://pgbouncer'),
+            mock.patch.object(components, 'GitHub'),
+            mock.patch.object(components, 'Env', return_value=mock.MagicMock(vars={})),
+            mock.patch.object(components.DjangoApp, '_get_app_name_from_user',
+                              return_value='app'),
+            mock.patch.object(components.DjangoApp, '_get_domain_name_from_user',
+                              return_value='example.com'),
+            mock.patch.object(components.DjangoApp, '_select_from_list_input',
+                              return_value='io'),
+            mock.patch.object(components.DjangoApp, '_get_wsgi_application',
+                              return_value='app.wsgi:application'),
+            mock.patch.object(components.DjangoApp, '_get_confirm_from_user',
+                              return_value=True),
+        ]
+        with contextlib.ExitStack() as stack:
+            for patch in patches:
+                stack.enter_context(patch)
+            app._init_fields()
+        self.assertEqual(set(required), set(nested))
+        expected = set().union(*(cls.DEFAULT_APT_PACKAGES for cls in nested))
+        self.assertLessEqual(expected, required[components.DataBase])
+
+
+class NginxMicroCacheTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        logging.getLogger('paramiko').setLevel(logging.CRITICAL)
+
+    def setUp(self) -> None:
+        self.server = FakeSSHServer().start()
+        self.addCleanup(self.server.stop)
+        self.client = self.server.connect()
+        self.addCleanup(self.client.close)
+        config_dir = self.server.local_path(components.Component.CONFIG_DIR)
+        os.makedirs(config_dir)
+        for app_name, ttl in (('another', 5), ('myapp', 2)):
+            cache = self.microcache(app_name)
+            cache.ttl, cache.initialized = ttl, True
+            with open(os.path.join(config_dir, f'{cache.name}.NginxMicroCache'), 'wb') as fo:
+                pickle.dump(cache, fo)
+
+    def microcache(self, app_name):
+        cache = components.NginxMicroCache.__new__(components.NginxMicroCache)
+        cache.app_name, cache.name = app_name, f'{app_name}_microcache'
+        cache._ssh = self.client
+        return cache
+
+    def test_loads_own_dump(self):
+        cache = self.microcache('myapp')
+        with mock.patch.object(components.Component, '_select_from_list_input') as select:
+            cache._setup_component()
+        select.assert_not_called()
+        self.assertEqual(cache.ttl, 2)
+
+    def test_new_app(self):
+        cache = self.microcache('newapp')
+        with mock.patch.object(components.Component, '_select_from_list_input') as select, \
+                mock.patch.object(components.NginxMicroCache, '_init_component') as init:
+            cache._setup_component()
+        select.assert_not_called()
+        init.assert_called_once_with()
+
+
+class PgBouncerTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        logging.getLogger('paramiko').setLevel(logging.CRITICAL)
+
+    def auth_type(self, version_output):
+        shell = FakeShell([(r'^pgbouncer --version$', lambda match, server: (
+            0, version_output, ''))])
+        with FakeSSHServer(shell) as server:
+            client = server.connect()
+            self.addCleanup(client.close)
+            bouncer = components.PgBouncer.__new__(components.PgBouncer)
+            bouncer._ssh = client
+            with contextlib.redirect_stdout(io.StringIO()):
+                return bouncer.auth_type
+
+    def test_auth_type(self):
+        self.assertEqual(self.auth_type('PgBouncer 1.16.1\nlibevent 2.1.12-stable\n'),
+                         'scram-sha-256')
+        # Ubuntu 20.04
+        self.assertEqual(self.auth_type('PgBouncer version 1.12.0\n'), 'md5')
+
+
+if __name__ == '__main__':
+    unittest.main()
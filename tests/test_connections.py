@@ -0,0 +1,54 @@
+import logging
+import unittest
+from unittest import mock
+
+from dj_droplet.remote import SSHConnections
+from tests.fakessh import FakeSSHServer
+
+
+class SSHConnectionsTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        logging.getLogger('paramiko').setLevel(logging.CRITICAL)
+
+    def setUp(self) -> None:
+        self.server = FakeSSHServer().start()
+        self.addCleanup(self.server.stop)
+        patch = mock.patch.object(SSHConnections, '_connect', side_effect=self.connect)
+        self.connect_mock = patch.start()
+        self.addCleanup(patch.stop)
+        self.addCleanup(SSHConnections.close_all)
+
+    def connect(self, client, host, user):
+        client.connect(host, port=self.server.port, username=user, password='fake',
+                       look_for_keys=False, allow_agent=False)
+
+    def test_shared(self):
+        client = SSHConnections.get('127.0.0.1')
+        self.assertIs(SSHConnections.get('127.0.0.1'), client)
+        self.assertIsNot(SSHConnections.get('127.0.0.1', 'testapp'), client)
+        self.assertEqual(self.server.counters.connections, 2)
+
+    def test_revive(self):
+        client = SSHConnections.get('127.0.0.1')
+        client.get_transport().close()
+        self.assertIs(SSHConnections.revive(client), client)
+        self.assertTrue(client.get_transport().is_active())
+        self.assertEqual(self.connect_mock.call_count, 2)
+        self.assertEqual(self.server.counters.connections, 2)
+        # a live client is left alone
+        SSHConnections.revive(client)
+        SSHConnections.get('127.0.0.1')
+        self.assertEqual(self.connect_mock.call_count, 2)
+        _, stdout, _ = client.exec_command('true')
+        self.assertEqual(stdout.channel.recv_exit_status(), 0)
+
+    def test_unregistered(self):
+        client = self.server.connect()
+        client.close()
+        SSHConnections.revive(client)
+        self.connect_mock.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
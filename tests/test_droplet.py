@@ -0,0 +1,130 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+# the deploy modules import each other as scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'dj_droplet'))
+
+import droplet  # noqa: E402
+
+
+class PrefetchTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.prefetch = droplet.Prefetch()
+
+    def test_not_started(self):
+        fetch = mock.Mock(return_value=['ams3'])
+        self.assertEqual(self.prefetch.take('Region', fetch), ['ams3'])
+        fetch.assert_called_once_with()
+        self.assertEqual(self.prefetch.taken, [])
+
+    def test_taken_once(self):
+        background = mock.Mock(return_value=['prefetched'])
+        self.prefetch.start({'Region': background})
+        fetch = mock.Mock(return_value=['fetched'])
+        self.assertEqual(self.prefetch.take('Region', fetch), ['prefetched'])
+        fetch.assert_not_called()
+        # later listings are live
+        self.assertEqual(self.prefetch.take('Region', fetch), ['fetched'])
+        background.assert_called_once_with()
+        fetch.assert_called_once_with()
+        self.assertEqual(self.prefetch.taken, ['Region'])
+
+    def test_background_error(self):
+        self.prefetch.start({'Region': mock.Mock(side_effect=RuntimeError)})
+        fetch = mock.Mock(side_effect=ValueError)
+        self.assertRaises(ValueError, self.prefetch.take, 'Region', fetch)
+        fetch.assert_called_once_with()
+        self.assertEqual(self.prefetch.taken, [])
+
+
+class DoCtlIndexTestCase(unittest.TestCase):
+    REGIONS = [
+        {'slug': 'ams3', 'name': 'Amsterdam 3'},
+        {'slug': 'fra1', 'name': 'Frankfurt 1'},
+        {'name': 'no slug'},
+    ]
+
+    def setUp(self) -> None:
+        self.doctl = mock.Mock(return_value=self.REGIONS)
+        for patch in (mock.patch.object(droplet.Region, '_doctl', self.doctl),
+                      mock.patch.object(droplet.Region, '_cache_ttl', None),
+                      mock.patch.dict(droplet.DoCtlManager._indexes, clear=True)):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_lookups(self):
+        index = droplet.DoCtlIndex([droplet.Region(item) for item in self.REGIONS])
+        self.assertEqual(sorted(index.by_slug), ['ams3', 'fra1'])
+        self.assertEqual(index.by_name['Frankfurt 1'].slug, 'fra1')
+        self.assertEqual(len(index.items), 3)
+
+    def test_get_after_list(self):
+        regions = droplet.Region.objects().list()
+        self.assertEqual(self.doctl.call_count, 1)
+        # every manager of the class shares the listing
+        region = droplet.Region.objects().get('fra1')
+        self.assertIs(region, regions[1])
+        self.assertIsNone(droplet.Region.objects().get('nyc1'))
+        self.assertIsNone(droplet.Region.objects().get(None))
+        self.assertEqual(self.doctl.call_count, 1)
+
+    def test_get_lists_once(self):
+        self.assertEqual(droplet.Region.objects().get('ams3').name, 'Amsterdam 3')
+        droplet.Region.objects().get('fra1')
+        self.assertEqual(self.doctl.call_count, 1)
+        # a new listing replaces the index
+        droplet.Region.objects().list()
+        self.assertEqual(self.doctl.call_count, 2)
+        self.assertIsNotNone(droplet.Region.objects().get('ams3'))
+        self.assertEqual(self.doctl.call_count, 2)
+
+
+class DropletNamesTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.doctl = mock.Mock()
+        self.doctl.list.return_value = [{'id': 1, 'name': 'web'}, {'id': 2, 'name': 'db'}]
+        self.names = droplet.DropletNames(ttl=30)
+        for patch in (mock.patch.object(droplet.Droplet, '_doctl', self.doctl),
+                      mock.patch.dict(droplet.DoCtlManager._indexes, clear=True),
+                      mock.patch.object(droplet, 'droplet_names', self.names)):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def age(self, seconds):
+        droplet.DoCtlManager._indexes[droplet.Droplet].fetched -= seconds
+
+    def test_ttl(self):
+        self.assertIn('web', self.names)
+        self.assertNotIn('app', self.names)
+        self.assertEqual(self.names.names(), {'web', 'db'})
+        self.assertEqual(self.doctl.list.call_count, 1)
+        self.age(31)
+        self.doctl.list.return_value = [{'id': 3, 'name': 'app'}]
+        self.assertIn('app', self.names)
+        self.assertNotIn('web', self.names)
+        self.assertEqual(self.doctl.list.call_count, 2)
+
+    def test_reuses_listing(self):
+        droplet.Droplet.objects().list()
+        self.assertIn('db', self.names)
+        self.assertEqual(self.doctl.list.call_count, 1)
+
+    def test_created(self):
+        self.doctl.create.return_value = [{'id': 3, 'name': 'app'}]
+        # the name was validated first
+        self.assertNotIn('app', self.names)
+        with mock.patch.object(droplet, 'droplet_exists', return_value=False):
+            droplet.Droplet.objects().create('app', 'ubuntu-22-04-x64', 'ams3', 's-1vcpu-1gb')
+        # known before the next listing shows it
+        self.assertIn('app', self.names)
+        self.assertEqual(self.doctl.list.call_count, 1)
+        self.age(31)
+        self.assertNotIn('app', self.names)
+        self.assertEqual(self.names._created, set())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import contextlib
+import io
+import logging
+import os
+import sys
+import unittest
+
+# the deploy modules import each other as scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'dj_droplet'))
+
+from packages import AptPackages  # noqa: E402
+from remote import SFTPPool  # noqa: E402
+from state import StateIndex  # noqa: E402
+from tests.fakessh import FakeShell, FakeSSHServer  # noqa: E402
+
+DPKG_QUERY_OUTPUT = (
+    'nginx install ok installed\n'
+    'libpq-dev:amd64 install ok installed\n'
+    'postgresql install ok half-installed\n'
+    'redis-server deinstall ok config-files\n'
+)
+
+
+class AptPackagesTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        logging.getLogger('paramiko').setLevel(logging.CRITICAL)
+
+    def setUp(self) -> None:
+        self.shell = FakeShell()
+        self.server = FakeSSHServer(self.shell).start()
+        self.addCleanup(self.server.stop)
+        self.client = self.server.connect()
+        self.packages = AptPackages(self.client)
+
+    def tearDown(self) -> None:
+        SFTPPool.close(self.client)
+        StateIndex._indexes.pop(self.client, None)
+        self.client.close()
+
+    def install(self, **kwargs):
+        self.shell.history.clear()
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.packages.install(**kwargs)
+
+    def commands(self, name):
+        return [cmd for cmd in self.shell.history if name in cmd]
+
+    def test_query_parsing(self):
+        self.shell.rules.insert(0, (r'^dpkg-query ', lambda match, server: (
+            0, DPKG_QUERY_OUTPUT, '')))
+        self.packages.require(['nginx', 'libpq-dev', 'postgresql', 'redis-server'])
+        self.install()
+        # half-installed and removed packages are reinstalled
+        install, = self.commands('apt-get install')
+        self.assertTrue(install.endswith('apt-get install -y postgresql redis-server'))
+        self.assertEqual(self.packages.installed,
+                         {'nginx', 'libpq-dev', 'postgresql', 'redis-server'})
+
+    def test_skip_installed(self):
+        self.shell.packages.update(['nginx', 'redis-server'])
+        self.packages.require(['nginx', 'redis-server'])
+        self.install()
+        self.assertEqual(len(self.commands('dpkg-query')), 1)
+        self.assertEqual(self.commands('apt-get'), [])
+        # known to be installed, not even queried again
+        self.install()
+        self.assertEqual(self.shell.history, [])
+
+    def test_union_install(self):
+        self.shell.packages.add('nginx')
+        self.packages.require(['nginx', 'postgresql'])
+        self.packages.require(['postgresql', 'redis-server'])
+        self.install()
+        query, = self.commands('dpkg-query')
+        self.assertIn(' nginx postgresql redis-server ', query)
+        install, = self.commands('apt-get install')
+        self.assertTrue(install.endswith('apt-get install -y postgresql redis-server'))
+        self.packages.require(['libpq-dev'])
+        self.install()
+        query, = self.commands('dpkg-query')
+        self.assertIn(' libpq-dev ', query)
+
+    def test_force(self):
+        self.shell.packages.update(['nginx', 'postgresql'])
+        self.packages.require(['nginx', 'postgresql'])
+        self.install()
+        self.install(force=True)
+        self.assertEqual(self.commands('dpkg-query'), [])
+        install, = self.commands('apt-get install')
+        self.assertTrue(install.startswith('sudo apt-get update && '))
+        self.assertTrue(install.endswith('apt-get install -y nginx postgresql'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import itertools
+import socket
+import time
+import unittest
+
+from dj_droplet.remote import DropletNotReady, backoff, probe_ssh, wait_for_ssh
+from tests.fakessh import FakeSSHServer
+
+
+class ReadinessTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        # generating the host key takes longer than a probe waits
+        FakeSSHServer.host_key()
+
+    def test_backoff(self):
+        delays = list(itertools.islice(backoff(3, initial=0.5, factor=2, maximum=1.5), 4))
+        self.assertEqual(delays, [0.5, 1.0, 1.5, 1.5])
+        self.assertEqual(list(backoff(0)), [])
+
+    def test_ssh_banner(self):
+        with FakeSSHServer() as server:
+            self.assertTrue(probe_ssh('127.0.0.1', server.port))
+            wait_for_ssh('127.0.0.1', server.port, deadline=1)
+
+    def test_deadline(self):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        st = time.time()
+        self.assertRaises(DropletNotReady, wait_for_ssh, '127.0.0.1', port, deadline=0.5)
+        self.assertLess(time.time() - st, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,175 @@
+import contextlib
+import io
+import logging
+import os
+import sys
+import unittest
+
+# the deploy modules import each other as scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'dj_droplet'))
+
+import components  # noqa: E402
+from components import DjangoApp  # noqa: E402
+from droplet import Droplet  # noqa: E402
+from remote import SFTPPool  # noqa: E402
+from state import StateIndex  # noqa: E402
+from tests.fakessh import FakeShell, FakeSSHServer  # noqa: E402
+
+DROPLET = {
+    'id': 1, 'name': 'test', 'memory': 2048, 'vcpus': 2, 'disk': 50,
+    'size_slug': 's-2vcpu-2gb', 'region': {'slug': 'ams3'},
+    'image': {'slug': 'ubuntu-22-04-x64'},
+    'networks': {'v4': [{'type': 'public', 'ip_address': '127.0.0.1'}]},
+}
+
+
+class GitHub:
+    branch = 'main'
+    url = 'https://github.com/example/testapp.git'
+
+
+class ReleaseTestCase(unittest.TestCase):
+    """ DjangoApp's release handling against FakeShell, which runs the
+    previous, prune, reuse_static and activate scripts for real """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        logging.getLogger('paramiko').setLevel(logging.CRITICAL)
+
+    def setUp(self) -> None:
+        self.shell = FakeShell()
+        self.server = FakeSSHServer(self.shell).start()
+        self.addCleanup(self.server.stop)
+        self.home = self.server.local_path('/home/testapp')
+        for name in ('releases', 'venvs'):
+            os.makedirs(os.path.join(self.home, name))
+        self.client = self.server.connect()
+        self.app = DjangoApp.__new__(DjangoApp)
+        self.app.name = 'testapp'
+        self.app.gunicorn_profile = 'io'
+        self.app.github = GitHub()
+        self.app.droplet = Droplet(DROPLET)
+        self.app._ssh = self.client
+
+    def tearDown(self) -> None:
+        SFTPPool.close(self.client)
+        StateIndex._indexes.pop(self.client, None)
+        self.client.close()
+
+    def deploy(self, sha, changed=(), venv=None, **kwargs):
+        self.shell.head = sha
+        self.shell.changed = list(changed)
+        self.shell.venv = venv or self.shell.venv
+        self.shell.history.clear()
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.app._deploy_release(**kwargs)
+
+    def ran(self, command):
+        return any(command in cmd for cmd in self.shell.history)
+
+    def releases(self):
+        return sorted(os.listdir(os.path.join(self.home, 'releases')))
+
+    def current(self):
+        return os.path.basename(os.readlink(os.path.join(self.home, 'current')))
+
+    def test_first_release(self):
+        self.deploy('a' * 40)
+        self.assertEqual(self.current(), 'a' * 40)
+        self.assertFalse(self.ran('diff --name-only'))
+        for job in DjangoApp.DEFAULT_POST_DEPLOY_JOBS:
+            self.assertTrue(self.ran(job.split(' ', 1)[1]))
+
+    def test_up_to_date(self):
+        self.deploy('a' * 40)
+        self.deploy('a' * 40)
+        self.assertEqual(len(self.shell.history), 1)
+        self.assertIn("<<'FETCH_RELEASE'", self.shell.history[0])
+
+    def test_up_to_date_restart(self):
+        self.deploy('a' * 40)
+        self.deploy('a' * 40, restart=True)
+        self.assertTrue(self.ran('systemctl daemon-reload && systemctl restart testapp'))
+        self.assertFalse(self.ran("<<'BUILD_RELEASE'"))
+
+    def test_forced_redeploy(self):
+        self.deploy('a' * 40)
+        self.deploy('a' * 40, force=True)
+        self.assertTrue(self.ran("<<'BUILD_RELEASE'"))
+
+    def test_code_change_reloads(self):
+        self.deploy('a' * 40)
+        self.deploy('b' * 40, changed=['app/views.py'])
+        self.assertEqual(self.current(), 'b' * 40)
+        self.assertTrue(self.ran('reload-or-restart testapp'))
+        self.assertFalse(self.ran('systemctl restart testapp'))
+
+    def test_requirements_change_restarts(self):
+        self.deploy('a' * 40, venv='venva')
+        self.deploy('b' * 40, changed=['requirements.txt'], venv='venvb')
+        venv = os.readlink(os.path.join(self.home, 'releases', 'b' * 40, 'venv'))
+        self.assertEqual(os.path.basename(venv), 'venvb')
+        # HUP forked workers would keep the old master's venv
+        self.assertTrue(self.ran('systemctl restart testapp'))
+        self.assertFalse(self.ran('reload-or-restart testapp'))
+        for job in DjangoApp.DEFAULT_POST_DEPLOY_JOBS:
+            self.assertTrue(self.ran(job.split(' ', 1)[1]))
+
+    def test_job_selection(self):
+        self.deploy('a' * 40)
+        os.makedirs(os.path.join(self.home, 'releases', 'a' * 40, 'staticfiles'))
+        self.deploy('b' * 40, changed=['app/migrations/0002_auto.py'])
+        self.assertTrue(self.ran('manage.py migrate'))
+        self.assertFalse(self.ran('manage.py collectstatic'))
+        self.assertTrue(os.path.isdir(os.path.join(self.home, 'releases', 'b' * 40, 'staticfiles')))
+        self.deploy('c' * 40, changed=['app/static/app/site.css'])
+        self.assertTrue(self.ran('manage.py collectstatic'))
+        self.assertFalse(self.ran('manage.py migrate'))
+        self.assertFalse(self.ran('cp -al'))
+
+    def test_reuse_static_fallback(self):
+        self.deploy('a' * 40)
+        # no staticfiles in the old release to link
+        self.deploy('b' * 40, changed=['app/views.py'])
+        self.assertTrue(self.ran('cp -al'))
+        self.assertTrue(self.ran('manage.py collectstatic'))
+        self.assertFalse(self.ran('manage.py migrate'))
+
+    def test_rollback(self):
+        for index, sha in enumerate(('a' * 40, 'b' * 40, 'c' * 40)):
+            self.deploy(sha, changed=['app/views.py'], venv=f'venv{index}')
+            os.utime(os.path.join(self.home, 'releases', sha), (index, index))
+        self.shell.history.clear()
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.app.rollback()
+        self.assertEqual(self.current(), 'b' * 40)
+        self.assertTrue(self.ran('systemctl restart testapp'))
+
+    def test_rollback_without_releases(self):
+        self.deploy('a' * 40)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertRaises(components.CmdException, self.app.rollback)
+        self.assertEqual(self.current(), 'a' * 40)
+
+    def test_prune(self):
+        shas = [str(index) * 40 for index in range(DjangoApp.KEEP_RELEASES + 2)]
+        for index, sha in enumerate(shas):
+            self.deploy(sha, changed=['app/views.py'], venv=f'venv{index}')
+            os.utime(os.path.join(self.home, 'releases', sha), (index, index))
+        self.assertEqual(self.releases(), sorted(shas[-DjangoApp.KEEP_RELEASES:]))
+        self.assertEqual(self.current(), shas[-1])
+        # venvs no release links to are removed with their releases
+        self.assertEqual(sorted(os.listdir(os.path.join(self.home, 'venvs'))),
+                         [f'venv{index}' for index in range(2, len(shas))])
+
+    def test_one_offs_not_recorded(self):
+        self.deploy('a' * 40)
+        self.deploy('b' * 40, changed=['app/views.py'])
+        self.app._flush_state()
+        self.assertFalse(os.path.exists(self.server.local_path(
+            f'{components.Component.CONFIG_DIR}/{StateIndex.FILE_NAME}')))
+
+
+if __name__ == '__main__':
+    unittest.main()
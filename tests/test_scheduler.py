@@ -0,0 +1,55 @@
+import time
+import unittest
+
+from dj_droplet.scheduler import CyclicDependency, DagScheduler, Step
+
+
+class DagSchedulerTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.sleeps = {'a': 0.1, 'b': 0.4, 'c': 0.1, 'd': 0.1}
+        self.steps = [
+            Step('a', 'a'),
+            Step('b', 'b', after=['a']),
+            Step('c', 'c', after=['a']),
+            Step('d', 'd', after=['b', 'c']),
+        ]
+
+    def test_run_respects_dependencies(self):
+        finished = []
+
+        def run(step):
+            for name in step.after:
+                self.assertIn(name, finished)
+            time.sleep(self.sleeps[step.name])
+            finished.append(step.name)
+
+        scheduler = DagScheduler(self.steps)
+        st = time.time()
+        scheduler.run(run)
+        tt = time.time() - st
+        self.assertEqual(sorted(finished), ['a', 'b', 'c', 'd'])
+        self.assertLess(tt, sum(self.sleeps.values()),
+                        msg='Independent steps should overlap')
+        path, total = scheduler.critical_path()
+        self.assertEqual(path, ['a', 'b', 'd'])
+        self.assertGreaterEqual(total, 0.6)
+
+    def test_failure_stops_dependents(self):
+        finished = []
+
+        def run(step):
+            if step.name == 'b':
+                raise RuntimeError('b failed')
+            finished.append(step.name)
+
+        scheduler = DagScheduler(self.steps)
+        self.assertRaises(RuntimeError, scheduler.run, run)
+        self.assertNotIn('d', finished)
+
+    def test_cycle(self):
+        steps = [Step('a', 'a', after=['b']), Step('b', 'b', after=['a'])]
+        self.assertRaises(CyclicDependency, DagScheduler, steps)
+
+
+if __name__ == '__main__':
+    unittest.main()
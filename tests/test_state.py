@@ -0,0 +1,116 @@
+import logging
+import os
+import pickle
+import sys
+import unittest
+from unittest import mock
+
+# the deploy modules import each other as scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'dj_droplet'))
+
+from remote import SFTPPool  # noqa: E402
+from state import StateIndex  # noqa: E402
+from tests import fakessh  # noqa: E402
+
+CONFIG_DIR = '.django_applet'
+
+
+class StateIndexTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        logging.getLogger('paramiko').setLevel(logging.CRITICAL)
+
+    def setUp(self) -> None:
+        self.server = fakessh.FakeSSHServer().start()
+        self.addCleanup(self.server.stop)
+        self.config_dir = self.server.local_path(CONFIG_DIR)
+        self.clients = []
+
+    def tearDown(self) -> None:
+        for client in self.clients:
+            SFTPPool.close(client)
+            client.close()
+
+    def index(self):
+        """ A fresh index, as a new run would open it """
+        client = self.server.connect()
+        self.clients.append(client)
+        return StateIndex(client, CONFIG_DIR)
+
+    def write(self, name, data):
+        os.makedirs(self.config_dir, exist_ok=True)
+        with open(os.path.join(self.config_dir, name), 'wb') as fo:
+            fo.write(data)
+
+    def read_index(self):
+        with open(os.path.join(self.config_dir, StateIndex.FILE_NAME), 'rb') as fo:
+            return pickle.load(fo)
+
+    def test_round_trip(self):
+        index = self.index()
+        self.assertIsNone(index.get('a.Command'))
+        index.set('a.Command', {'status': 'done'})
+        index.flush()
+        index = self.index()
+        self.assertEqual(index.get('a.Command'), {'status': 'done'})
+        self.assertIn('a.Command', index)
+
+    def test_load_once(self):
+        self.write(StateIndex.FILE_NAME, pickle.dumps({'a.Command': pickle.dumps(1)}))
+        index = self.index()
+        self.server.counters.reset()
+        index.get('a.Command')
+        loaded = self.server.counters.sftp_ops
+        for key in ('a.Command', 'b.Command', 'c.Command'):
+            index.get(key)
+            index.set(key, 2)
+        self.assertIn('a.Command', index)
+        self.assertEqual(self.server.counters.sftp_ops, loaded)
+
+    def test_legacy_import(self):
+        self.write('a.Command', pickle.dumps('legacy a'))
+        self.write('b.Command', pickle.dumps('legacy b'))
+        self.write('app.DjangoApp', pickle.dumps('not a command'))
+        index = self.index()
+        self.assertEqual(index.get('a.Command'), 'legacy a')
+        self.assertNotIn('app.DjangoApp', index)
+        # imported entries are written to the index on the next flush
+        index.flush()
+        self.assertEqual(sorted(self.read_index()), ['a.Command', 'b.Command'])
+
+    def test_flush_dirty_only(self):
+        index = self.index()
+        index.set('a.Command', 1)
+        index.flush()
+        index = self.index()
+        index.set('a.Command', 1)
+        self.server.counters.reset()
+        index.flush()
+        self.assertEqual(self.server.counters.sftp_ops, 0, msg='Unchanged values are not written')
+        index.set('a.Command', 2)
+        index.flush()
+        self.assertGreater(self.server.counters.sftp_ops, 0)
+        self.assertEqual(pickle.loads(self.read_index()['a.Command']), 2)
+
+    def test_flush_replaces_atomically(self):
+        self.write(StateIndex.FILE_NAME, pickle.dumps({'a.Command': pickle.dumps(1)}))
+        index = self.index()
+        index.set('b.Command', 2)
+        path = f'{CONFIG_DIR}/{StateIndex.FILE_NAME}'
+        with mock.patch.object(fakessh._SFTPServer, 'posix_rename', autospec=True,
+                               side_effect=fakessh._SFTPServer.rename) as rename:
+            index.flush()
+        rename.assert_called_once_with(mock.ANY, f'{path}.tmp', path)
+        self.assertEqual(sorted(self.read_index()), ['a.Command', 'b.Command'])
+        self.assertNotIn(f'{StateIndex.FILE_NAME}.tmp', os.listdir(self.config_dir))
+
+    def test_flush_creates_config_dir(self):
+        index = self.index()
+        index.set('a.Command', 1)
+        index.flush()
+        self.assertEqual(list(self.read_index()), ['a.Command'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+
+from dj_droplet.tuning import (GunicornProfile, GunicornTuning, MicroCacheTuning,
+                               NginxProfile, NginxTuning, PostgresTuning,
+                               RedisTuning)
+
+
+class GunicornTuningTestCase(unittest.TestCase):
+    def test_cpu_profile(self):
+        tuning = GunicornTuning(4, 8192, GunicornProfile.CPU)
+        self.assertEqual(tuning.workers, 9)
+        self.assertEqual(tuning.worker_class, 'sync')
+        self.assertNotIn('--threads', tuning.args)
+
+    def test_io_profile(self):
+        tuning = GunicornTuning(2, 4096, GunicornProfile.IO)
+        self.assertEqual(tuning.workers, 3)
+        self.assertEqual(tuning.threads, 4)
+        self.assertIn('--worker-class gthread', tuning.args)
+        self.assertIn('--threads 4', tuning.args)
+
+    def test_memory_bound(self):
+        tuning = GunicornTuning(1, 512, GunicornProfile.CPU)
+        self.assertEqual(tuning.workers, 1)
+        tuning = GunicornTuning(8, 1024, GunicornProfile.CPU)
+        self.assertEqual(tuning.workers, 4)
+
+    def test_unknown_profile(self):
+        self.assertRaises(ValueError, GunicornTuning, 1, 1024, 'gevent')
+
+
+class NginxTuningTestCase(unittest.TestCase):
+    def test_profiles(self):
+        balanced = NginxTuning(2, 2048, NginxProfile.BALANCED, upstream_connections=12)
+        high = NginxTuning(2, 2048, NginxProfile.HIGH_TRAFFIC, upstream_connections=12)
+        self.assertGreater(high.worker_connections, balanced.worker_connections)
+        self.assertEqual(high.worker_rlimit_nofile, 2 * high.worker_connections)
+        self.assertEqual(balanced.keepalive, 12)
+
+    def test_keepalive_capped(self):
+        tuning = NginxTuning(8, 16384, NginxProfile.BALANCED, upstream_connections=100)
+        self.assertEqual(tuning.keepalive, 16)
+
+
+class MicroCacheTuningTestCase(unittest.TestCase):
+    def test_sizes(self):
+        tuning = MicroCacheTuning(2048, 50)
+        self.assertEqual(tuning.keys_zone, 8)
+        self.assertEqual(tuning.max_size, 1024)
+        tuning = MicroCacheTuning(512, 10)
+        self.assertEqual(tuning.keys_zone, 2)
+        self.assertEqual(tuning.max_size, 204)
+
+
+class PostgresTuningTestCase(unittest.TestCase):
+    def test_memory_settings(self):
+        settings = PostgresTuning(2, 2048).settings
+        self.assertEqual(settings['shared_buffers'], '512MB')
+        self.assertEqual(settings['effective_cache_size'], '1536MB')
+        self.assertEqual(settings['maintenance_work_mem'], '128MB')
+        self.assertEqual(settings['random_page_cost'], 1.1)
+        self.assertNotIn('max_parallel_workers', settings)
+
+    def test_parallel_workers(self):
+        settings = PostgresTuning(8, 16384, disk_type='hdd').settings
+        self.assertEqual(settings['max_parallel_workers'], 8)
+        self.assertEqual(settings['max_parallel_workers_per_gather'], 4)
+        self.assertEqual(settings['wal_buffers'], '16MB')
+        self.assertEqual(settings['random_page_cost'], 4)
+
+
+class RedisTuningTestCase(unittest.TestCase):
+    def test_maxmemory(self):
+        self.assertEqual(RedisTuning(2048).maxmemory, 512)
+        self.assertEqual(RedisTuning(0).maxmemory, 32)
+
+
+if __name__ == '__main__':
+    unittest.main()